@@ -0,0 +1,211 @@
+# audit_log.py
+"""Append-only audit log of scoring decisions.
+
+Each record holds the timestamp, where the decision was made, the model
+version (SHA-256 of the model file), the input features, the repayment
+probability, the credit score, the risk band and the decision.
+
+AuditLog.record() only puts the entry on a bounded in-memory queue. A
+background thread drains the queue and writes whole batches to SQLite (WAL
+mode, one transaction per batch), so the caller never waits on disk. If the
+writer falls behind and the queue fills, record() blocks rather than
+dropping entries. Triggers reject UPDATE and DELETE on the table.
+
+Usage:
+    python audit_log.py query [--since 2026-10-01] [--until 2026-10-31] [--decision Decline] [--limit 100]
+    python audit_log.py query --count --decision Approve
+"""
+
+import argparse
+import atexit
+import csv
+import datetime
+import json
+import queue
+import sqlite3
+import sys
+import threading
+
+import numpy as np
+
+DB_PATH = "audit_log.sqlite"
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS decisions (
+    id INTEGER PRIMARY KEY,
+    timestamp TEXT NOT NULL,
+    source TEXT NOT NULL,
+    model_version TEXT,
+    proba_good REAL NOT NULL,
+    credit_score REAL NOT NULL,
+    risk_level TEXT NOT NULL,
+    decision TEXT NOT NULL,
+    features TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS decisions_timestamp ON decisions (timestamp);
+CREATE INDEX IF NOT EXISTS decisions_decision ON decisions (decision, timestamp);
+CREATE TRIGGER IF NOT EXISTS decisions_no_update BEFORE UPDATE ON decisions
+BEGIN SELECT RAISE(ABORT, 'audit log is append-only'); END;
+CREATE TRIGGER IF NOT EXISTS decisions_no_delete BEFORE DELETE ON decisions
+BEGIN SELECT RAISE(ABORT, 'audit log is append-only'); END;
+"""
+COLUMNS = ["timestamp", "source", "model_version", "proba_good", "credit_score", "risk_level", "decision", "features"]
+INSERT = f"INSERT INTO decisions ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})"
+
+
+def connect(path=DB_PATH):
+    connection = sqlite3.connect(path, check_same_thread=False)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.executescript(SCHEMA)
+    return connection
+
+
+def _features_json(features):
+    """JSON object of the features, with NumPy scalars as plain numbers."""
+    return json.dumps({key: value.item() if isinstance(value, np.generic) else value
+                       for key, value in features.items()}, sort_keys=True)
+
+
+class AuditLog:
+    """Bounded queue in front of a background SQLite writer."""
+
+    def __init__(self, path=DB_PATH, max_queue=10000, batch_size=500, flush_interval=0.5):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.written = 0
+        self.failed = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._closed = False
+        connect(path).close()
+        self._writer = threading.Thread(target=self._run, name="audit-log-writer", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    def record(self, features, proba_good, credit_score, risk_level, decision, model_version=None,
+               source="app", timestamp=None):
+        """Queue one decision; timestamp is a datetime (default: now)."""
+        timestamp = timestamp or datetime.datetime.now()
+        self._queue.put((
+            timestamp.strftime(TIMESTAMP_FORMAT),
+            source,
+            model_version,
+            float(proba_good),
+            float(credit_score),
+            str(risk_level),
+            str(decision),
+            dict(features),
+        ))
+
+    def record_many(self, features, proba_good, credit_score, risk_level, decision, model_version=None,
+                    source="app", timestamp=None):
+        """Queue one decision per row: features is a list of dicts, the rest are sequences of the same length."""
+        timestamp = timestamp or datetime.datetime.now()
+        for row in zip(features, proba_good, credit_score, risk_level, decision):
+            self.record(*row, model_version=model_version, source=source, timestamp=timestamp)
+
+    def flush(self):
+        """Block until everything queued so far is on disk."""
+        self._queue.join()
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._queue.put(None)
+            self._writer.join()
+
+    def _run(self):
+        connection = connect(self.path)
+        try:
+            while True:
+                try:
+                    batch = [self._queue.get(timeout=self.flush_interval)]
+                except queue.Empty:
+                    continue
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                # Features are serialized here, off the caller's thread
+                rows = [row[:-1] + (_features_json(row[-1]),) for row in batch if row is not None]
+                if rows:
+                    try:
+                        with connection:
+                            connection.executemany(INSERT, rows)
+                        self.written += len(rows)
+                    except sqlite3.Error as e:
+                        self.failed += len(rows)
+                        print(f"audit log: failed to write {len(rows)} decisions: {e}", file=sys.stderr)
+                for _ in batch:
+                    self._queue.task_done()
+                if len(rows) < len(batch):
+                    return
+        finally:
+            connection.close()
+
+
+# --- Query ---
+def _bound(value, end=False):
+    """Timestamp string for a --since/--until value; a bare date ends at the end of that day."""
+    moment = datetime.datetime.fromisoformat(value)
+    if end and len(value) <= 10:
+        moment += datetime.timedelta(days=1)
+    return moment.strftime(TIMESTAMP_FORMAT)
+
+
+def query(path=DB_PATH, since=None, until=None, decision=None, limit=None, count=False):
+    """Rows (as dicts) or a count matching the filters, oldest first."""
+    clauses, params = [], []
+    if since:
+        clauses.append("timestamp >= ?")
+        params.append(_bound(since))
+    if until:
+        clauses.append("timestamp < ?" if len(until) <= 10 else "timestamp <= ?")
+        params.append(_bound(until, end=True))
+    if decision:
+        clauses.append("decision = ?")
+        params.append(decision)
+    where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+
+    connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        if count:
+            return connection.execute(f"SELECT COUNT(*) FROM decisions{where}", params).fetchone()[0]
+        sql = f"SELECT id, {', '.join(COLUMNS)} FROM decisions{where} ORDER BY timestamp, id"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        cursor = connection.execute(sql, params)
+        names = [column[0] for column in cursor.description]
+        return [dict(zip(names, row)) for row in cursor]
+    finally:
+        connection.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query the scoring decision audit log.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    find = sub.add_parser("query", help="print matching decisions as CSV")
+    find.add_argument("--db", default=DB_PATH)
+    find.add_argument("--since", help="start date or timestamp (inclusive), e.g. 2026-10-01")
+    find.add_argument("--until", help="end date or timestamp (inclusive), e.g. 2026-10-31")
+    find.add_argument("--decision", choices=["Approve", "Decline"])
+    find.add_argument("--limit", type=int)
+    find.add_argument("--count", action="store_true", help="print only the number of matching decisions")
+    args = parser.parse_args(argv)
+
+    result = query(args.db, since=args.since, until=args.until, decision=args.decision,
+                   limit=args.limit, count=args.count)
+    if args.count:
+        print(result)
+        return
+    writer = csv.DictWriter(sys.stdout, fieldnames=["id"] + COLUMNS)
+    writer.writeheader()
+    writer.writerows(result)
+
+
+if __name__ == "__main__":
+    main()
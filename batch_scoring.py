@@ -0,0 +1,174 @@
+# batch_scoring.py
+"""Score a whole loan book with the logistic pipeline, one chunk at a time.
+
+Usage:
+    python batch_scoring.py applicants.csv scored.csv [--chunksize 50000]
+
+The input CSV holds the same fields as the Streamlit form (loanamount,
+termdays, repayment_curr_ratio, ..., employment_status_clients). Any other
+columns (e.g. customerid) are copied through to the output unchanged.
+
+With --from-history, the payment-history and profile fields may be left out
+of the input; they are looked up by customerid from the loan history CSVs
+(see feature_store.py).
+
+Files of already-engineered model inputs (sqrt_loanamount, sqrt_termdays,
+sqrt_avg_prev_interest instead of the raw amounts) are accepted too; the raw
+fields are recovered from the sqrt_* columns.
+
+With --explain, one contrib_<feature> column per model input is added: the
+exact logit contribution from explain.py (logistic models only).
+
+Scores, bands and decisions use the fitted score mapping in
+score_mapping.json when it exists and was fitted for --model (see
+calibration.py); proba_good is the model's raw probability either way.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import explain
+import feature_store
+import file_utils
+import model_backends
+import scoring_core
+
+MODEL_PATH = "logistic_loan_default.pkl"
+
+# Raw inputs that can be recovered from an engineered file's sqrt_* columns
+SQRT_SOURCES = {
+    "loanamount": "sqrt_loanamount",
+    "termdays": "sqrt_termdays",
+    "avg_prev_interest": "sqrt_avg_prev_interest",
+}
+
+
+def feature_frame(df):
+    """Model input frame (FEATURE_COLUMNS) for a frame of raw applicants."""
+    features = scoring_core.engineer_features(df)
+    return pd.DataFrame(features, index=df.index)[scoring_core.FEATURE_COLUMNS]
+
+
+def raw_from_engineered(chunk):
+    """Fill raw inputs missing from chunk by squaring their sqrt_* columns."""
+    missing = {col: source for col, source in SQRT_SOURCES.items()
+               if col not in chunk.columns and source in chunk.columns}
+    if not missing:
+        return chunk
+    chunk = chunk.copy()
+    for col, source in missing.items():
+        chunk[col] = chunk[source].astype(float) ** 2
+    return chunk
+
+
+def score_chunk(model, chunk, explainer=None, mapping=None):
+    """Score one chunk of raw applicants with a single predict_proba call.
+
+    Rows with a missing input (e.g. a customerid absent from the history)
+    are not sent to the model; they get an empty score and an
+    "Insufficient data" decision. With an explainer, contrib_* columns are
+    added from one contribution matrix for the chunk.
+    """
+    complete = chunk[scoring_core.INPUT_COLUMNS].notna().all(axis=1).to_numpy()
+    proba_good = np.full(len(chunk), np.nan)
+    if explainer is not None:
+        contributions = np.full((len(chunk), len(explainer.features)), np.nan)
+    if complete.any():
+        features = feature_frame(chunk.loc[complete, scoring_core.INPUT_COLUMNS])
+        proba_good[complete] = model.predict_proba(features)[:, 1]
+        if explainer is not None:
+            contributions[complete] = explainer.contribution_matrix(features)
+    summary = scoring_core.summarize(proba_good, mapping)
+
+    scored = chunk.copy()
+    scored["proba_good"] = proba_good
+    scored["credit_score"] = np.round(summary["credit_score"], 2)
+    scored["risk_level"] = np.where(complete, summary["risk_level"], "")
+    scored["decision"] = np.where(complete, summary["decision"], "Insufficient data")
+    if explainer is not None:
+        for j, feature in enumerate(explainer.features):
+            scored[f"contrib_{feature}"] = contributions[:, j]
+    return scored
+
+
+def iter_scored_chunks(model, source, chunksize=50000, customers=None, explainer=None, mapping=None):
+    """Yield scored chunks of a CSV (path or file-like object), one chunk in memory at a time.
+
+    If customers (a feature_store frame indexed by customerid) is given,
+    missing aggregate columns are filled from it.
+    """
+    dtypes = {col: "float64" for col in scoring_core.NUMERIC_INPUTS + list(SQRT_SOURCES.values())}
+    dtypes.update({col: "object" for col in scoring_core.CATEGORICAL_INPUTS})
+
+    for chunk in pd.read_csv(source, chunksize=chunksize, dtype=dtypes):
+        chunk = raw_from_engineered(chunk)
+        if customers is not None:
+            chunk = feature_store.fill_from_store(chunk, customers)
+        missing = [col for col in scoring_core.INPUT_COLUMNS if col not in chunk.columns]
+        if missing:
+            raise ValueError(f"Input is missing required columns: {', '.join(missing)}")
+        yield score_chunk(model, chunk, explainer=explainer, mapping=mapping)
+
+
+def score_file(model, input_path, output_path, chunksize=50000, customers=None, explainer=None, mapping=None,
+               log=sys.stderr):
+    """Stream input_path through the model and write results to output_path.
+
+    Only one chunk is held in memory at a time, so memory use depends on
+    chunksize rather than on the size of the loan book.
+    """
+    total_rows = 0
+    start = time.perf_counter()
+    chunks = iter_scored_chunks(model, input_path, chunksize=chunksize, customers=customers, explainer=explainer,
+                                mapping=mapping)
+    for i, scored in enumerate(chunks):
+        scored.to_csv(output_path, mode="w" if i == 0 else "a", header=(i == 0), index=False)
+
+        total_rows += len(scored)
+        elapsed = time.perf_counter() - start
+        if log is not None:
+            print(f"chunk {i + 1}: {total_rows} rows, {total_rows / elapsed:,.0f} rows/sec", file=log)
+
+    elapsed = time.perf_counter() - start
+    return total_rows, elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch-score a CSV of loan applicants.")
+    parser.add_argument("input", help="CSV of applicants with the form fields as columns")
+    parser.add_argument("output", help="where to write the scored CSV")
+    parser.add_argument("--model", default=MODEL_PATH, help="model file: .pkl, .json, .ubj or .cbm (see model_backends.py)")
+    parser.add_argument("--chunksize", type=int, default=50000, help="rows scored per predict_proba call")
+    parser.add_argument("--from-history", action="store_true",
+                        help="look up missing history/profile fields by customerid from the loan history CSVs")
+    parser.add_argument("--explain", action="store_true",
+                        help="add per-feature contrib_* columns (logistic models only)")
+    parser.add_argument("--score-mapping", default=scoring_core.SCORE_MAPPING_PATH,
+                        help="fitted score mapping from calibration.py (used if the file exists)")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.model):
+        parser.error(f"model file '{args.model}' not found")
+
+    model = model_backends.load_model(args.model)
+    explainer = None
+    if args.explain:
+        explainer = explain.explainer_for(model)
+        if explainer is None:
+            parser.error("--explain needs a logistic model (.pkl or .json)")
+    customers = feature_store.load_customer_features() if args.from_history else None
+    mapping = scoring_core.mapping_for_model(scoring_core.load_score_mapping(args.score_mapping),
+                                             file_utils.file_sha256(args.model))
+    total_rows, elapsed = score_file(model, args.input, args.output, chunksize=args.chunksize,
+                                     customers=customers, explainer=explainer, mapping=mapping)
+    rate = total_rows / elapsed if elapsed > 0 else float("inf")
+    print(f"Scored {total_rows} rows in {elapsed:.2f}s ({rate:,.0f} rows/sec) -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
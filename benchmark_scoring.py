@@ -0,0 +1,212 @@
+# benchmark_scoring.py
+"""Benchmarks for the scoring path, with regression checks against a baseline.
+
+Synthetic applicants are bootstrapped from the real ones derived from
+trainperf.csv / trainprevloans.csv (see feature_store.py), so the feature
+distributions match what the model was trained on.
+
+Usage:
+    python benchmark_scoring.py [--output bench_results.json] [--sizes 1 100 10000 1000000]
+    python benchmark_scoring.py --compare baseline.json [--threshold 0.10]
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+import timeit
+import tracemalloc
+
+import joblib
+import numpy as np
+import pandas as pd
+import sklearn
+
+import batch_scoring
+import fast_scorer
+import feature_store
+import file_utils
+import scoring_core
+
+DEFAULT_SIZES = [1, 100, 10000, 1000000]
+DEFAULT_OUTPUT = "bench_results.json"
+
+# Metrics where a larger value is an improvement; everything else is lower-is-better
+HIGHER_IS_BETTER_PREFIXES = ("throughput_",)
+
+
+# --- Synthetic applicants ---
+def reference_applicants():
+    """Raw form inputs for every loan in trainperf.csv."""
+    frame = feature_store.load_training_frame()
+    return frame[scoring_core.INPUT_COLUMNS].reset_index(drop=True)
+
+
+def synthetic_applicants(reference, n_rows, seed=0):
+    """Bootstrap n_rows applicants from the reference rows."""
+    rng = np.random.default_rng(seed)
+    rows = rng.integers(0, len(reference), n_rows)
+    return reference.iloc[rows].reset_index(drop=True)
+
+
+# --- Measurements ---
+def cold_load_ms(model_path, repeats=3):
+    """Import + joblib.load time in a fresh interpreter, best of repeats."""
+    code = (
+        "import time; t = time.perf_counter(); import joblib; "
+        f"joblib.load({model_path!r}); print((time.perf_counter() - t) * 1000)"
+    )
+    times = []
+    for _ in range(repeats):
+        out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+        times.append(float(out.stdout.strip().splitlines()[-1]))
+    return min(times)
+
+
+def warm_load_ms(model_path, repeats=5):
+    timer = timeit.Timer(lambda: joblib.load(model_path))
+    return min(timer.repeat(repeat=repeats, number=1)) * 1000
+
+
+def single_row_latency_ms(model, applicants, repeats=300):
+    """p50/p99 of feature engineering + predict_proba for one applicant."""
+    rows = [applicants.iloc[[i % len(applicants)]] for i in range(repeats)]
+    latencies = np.empty(repeats)
+    for i, row in enumerate(rows):
+        start = time.perf_counter()
+        model.predict_proba(batch_scoring.feature_frame(row))
+        latencies[i] = time.perf_counter() - start
+    latencies *= 1000
+    return float(np.percentile(latencies, 50)), float(np.percentile(latencies, 99))
+
+
+def fast_single_row_us(scorer, applicants, number=20000):
+    record = scoring_core.engineer_features(applicants.iloc[0].to_dict())
+    return timeit.timeit(lambda: scorer.proba_one(record), number=number) / number * 1e6
+
+
+def batch_throughput(model, applicants, min_seconds=0.5):
+    """Rows/sec for feature engineering + one predict_proba over the whole batch."""
+    runs = 0
+    start = time.perf_counter()
+    while True:
+        model.predict_proba(batch_scoring.feature_frame(applicants))
+        runs += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            return runs * len(applicants) / elapsed
+
+
+def batch_peak_memory_mb(model, applicants):
+    """Peak traced allocation while scoring one batch."""
+    tracemalloc.start()
+    try:
+        model.predict_proba(batch_scoring.feature_frame(applicants))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / 2**20
+
+
+def run_benchmarks(model_path, sizes, log=sys.stderr):
+    def progress(message):
+        if log is not None:
+            print(message, file=log)
+
+    metrics = {}
+    progress("model load ...")
+    metrics["model_load_cold_ms"] = cold_load_ms(model_path)
+    metrics["model_load_warm_ms"] = warm_load_ms(model_path)
+
+    model = joblib.load(model_path)
+    reference = reference_applicants()
+
+    progress("single-row latency ...")
+    p50, p99 = single_row_latency_ms(model, reference)
+    metrics["single_row_p50_ms"] = p50
+    metrics["single_row_p99_ms"] = p99
+    metrics["fast_single_row_us"] = fast_single_row_us(fast_scorer.FastScorer.from_pipeline(model), reference)
+
+    for size in sizes:
+        progress(f"batch of {size} rows ...")
+        applicants = synthetic_applicants(reference, size)
+        metrics[f"throughput_rows_per_sec_{size}"] = batch_throughput(model, applicants)
+        metrics[f"peak_memory_mb_{size}"] = batch_peak_memory_mb(model, applicants)
+
+    metrics["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "scikit-learn": sklearn.__version__,
+            "model_path": model_path,
+            "model_sha256": file_utils.file_sha256(model_path),
+        },
+        "metrics": metrics,
+    }
+
+
+# --- Regression check ---
+def compare(current, baseline, threshold):
+    """Return (regressions, report_lines) comparing two result files' metrics."""
+    regressions = []
+    lines = []
+    for name, base_value in baseline["metrics"].items():
+        if name not in current["metrics"] or not base_value:
+            continue
+        value = current["metrics"][name]
+        change = (value - base_value) / base_value
+        higher_is_better = name.startswith(HIGHER_IS_BETTER_PREFIXES)
+        regressed = change < -threshold if higher_is_better else change > threshold
+        flag = "REGRESSION" if regressed else "ok"
+        lines.append(f"{name:38s} {base_value:14.3f} -> {value:14.3f} ({change:+.1%}) {flag}")
+        if regressed:
+            regressions.append(name)
+    return regressions, lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the loan default scoring path.")
+    parser.add_argument("--model", default=batch_scoring.MODEL_PATH)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="batch sizes to measure")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="where to write the results JSON")
+    parser.add_argument("--compare", metavar="BASELINE", help="flag regressions against a stored results file")
+    parser.add_argument("--threshold", type=float, default=0.10, help="relative change counted as a regression")
+    parser.add_argument("--current", metavar="RESULTS", help="compare an existing results file instead of re-running")
+    args = parser.parse_args(argv)
+
+    if args.current:
+        with open(args.current) as f:
+            results = json.load(f)
+    else:
+        results = run_benchmarks(args.model, args.sizes)
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        for name, value in results["metrics"].items():
+            print(f"{name:38s} {value:14.3f}")
+        print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions, lines = compare(results, baseline, args.threshold)
+        print(f"\nCompared against {args.compare} (threshold {args.threshold:.0%}):")
+        for line in lines:
+            print(line)
+        if regressions:
+            print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+            sys.exit(1)
+        print("No regressions.")
+
+
+if __name__ == "__main__":
+    main()
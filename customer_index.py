@@ -0,0 +1,259 @@
+# customer_index.py
+"""Prebuilt per-customer index for pre-filling the form by customerid.
+
+The index holds one row per customer, never one per loan, in
+customer_index/:
+
+    customerid.npy                  IDs, sorted
+    <history feature>.npy           the six feature_store.HISTORY_FEATURES aggregates
+    birthdate.npy                   datetime64[D]; age is computed at lookup time, so it never goes stale
+    bank_account_type.npy           int8 codes into scoring_core.FIELD_CHOICES (-1: no profile)
+    employment_status_clients.npy   likewise
+    slots.npy                       open-addressing hash table: slot -> row, -1 for empty
+    meta.json                       size and mtime of the source CSVs, row count
+
+A lookup hashes the ID (8-byte BLAKE2b, stable across processes), then
+probes slots.npy linearly. The table is at most half full, so a probe
+sequence is short whatever the number of customers. The hit row is an
+offset into every column file. All files are memory-mapped, so opening the
+index reads nothing up front. The first lookup in a process opens it,
+rebuilding it first if either CSV changed since the build.
+
+Values match feature_store.load_customer_features(). Customers with no
+previous loans get zero history; customers missing from
+traindemographics.csv get no age, bank or employment fields.
+
+Usage:
+    python customer_index.py build
+    python customer_index.py lookup 8a2a81a74ce8c05d014cfb32a0da1049
+    python customer_index.py verify        # every customer against feature_store; exits 1 on mismatch
+    python customer_index.py benchmark
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+import feature_store
+import file_utils
+import prediction_cache
+import scoring_core
+
+INDEX_DIR = "customer_index"
+INDEX_FORMAT = "customer-index/1"
+CATEGORICAL_FIELDS = ["bank_account_type", "employment_status_clients"]
+# Profile values the training data filled in for missing demographics fields
+CATEGORICAL_FILL = {"bank_account_type": "Other", "employment_status_clients": "Unknown"}
+
+
+def _hash(customerid):
+    return int.from_bytes(hashlib.blake2b(customerid.encode(), digest_size=8).digest(), "little")
+
+
+def hash_slots(ids):
+    """Open-addressing table over ids with a load factor of at most 0.5."""
+    size = 1 << max(4, (2 * len(ids) - 1).bit_length())
+    slots = np.full(size, -1, dtype=np.int32 if len(ids) < 2**31 else np.int64)
+    mask = size - 1
+    for row, customerid in enumerate(ids.tolist()):
+        slot = _hash(customerid) & mask
+        while slots[slot] >= 0:
+            slot = (slot + 1) & mask
+        slots[slot] = row
+    return slots
+
+
+# --- Build ---
+def build_columns(prevloans, demographics):
+    """Column arrays of the index, one row per customer in either CSV."""
+    history = feature_store.history_features(prevloans)
+    profile = demographics.set_index(demographics["customerid"].astype(object))
+    ids = np.array(sorted(set(history.index.astype(object)) | set(profile.index)), dtype=str)
+
+    columns = {"customerid": ids}
+    history = history.reindex(ids)
+    for col in feature_store.HISTORY_FEATURES:
+        columns[col] = history[col].fillna(0.0).to_numpy(dtype=np.float64)
+
+    profile = profile.reindex(ids)
+    has_profile = profile["customerid"].notna().to_numpy()
+    columns["birthdate"] = profile["birthdate"].to_numpy().astype("datetime64[D]")
+    for col in CATEGORICAL_FIELDS:
+        values = profile[col].astype(object).fillna(CATEGORICAL_FILL[col]).to_numpy()
+        codes = np.full(len(ids), -1, dtype=np.int8)
+        for code, choice in enumerate(scoring_core.FIELD_CHOICES[col]):
+            codes[has_profile & (values == choice)] = code
+        columns[col] = codes
+    columns["slots"] = hash_slots(ids)
+    return columns
+
+
+def _sources(prevloans_path, demographics_path):
+    return {path: list(prediction_cache.file_fingerprint(path)) for path in (prevloans_path, demographics_path)}
+
+
+def build_index(prevloans_path=feature_store.PREVLOANS_PATH, demographics_path=feature_store.DEMOGRAPHICS_PATH,
+                directory=INDEX_DIR):
+    """Build the index from the two CSVs and swap it into directory (file_utils.replace_directory)."""
+    columns = build_columns(feature_store.load_prevloans(prevloans_path),
+                            feature_store.load_demographics(demographics_path))
+    parent = os.path.dirname(os.path.abspath(directory))
+    tmp_dir = tempfile.mkdtemp(prefix=".tmp-", dir=parent)
+    for name, values in columns.items():
+        np.save(os.path.join(tmp_dir, f"{name}.npy"), values)
+    meta = {
+        "format": INDEX_FORMAT,
+        "customers": len(columns["customerid"]),
+        "sources": _sources(prevloans_path, demographics_path),
+    }
+    with open(os.path.join(tmp_dir, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=2)
+    file_utils.replace_directory(tmp_dir, directory)
+    return meta
+
+
+def index_is_fresh(prevloans_path, demographics_path, directory=INDEX_DIR):
+    try:
+        with open(os.path.join(directory, "meta.json")) as f:
+            meta = json.load(f)
+        sources = _sources(prevloans_path, demographics_path)
+    except (OSError, ValueError):
+        return False
+    return meta.get("format") == INDEX_FORMAT and meta.get("sources") == sources
+
+
+# --- Lookup ---
+class CustomerIndex:
+    """Memory-mapped customer columns with a hash lookup from customerid to row."""
+
+    def __init__(self, directory=INDEX_DIR):
+        self.directory = directory
+        load = lambda name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r")
+        self._ids = load("customerid")
+        self._slots = load("slots")
+        self._mask = len(self._slots) - 1
+        self._history = {col: load(col) for col in feature_store.HISTORY_FEATURES}
+        self._birthdate = load("birthdate")
+        self._categorical = {col: load(col) for col in CATEGORICAL_FIELDS}
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, customerid):
+        return self.row(customerid) is not None
+
+    def row(self, customerid):
+        """Row offset of a customer in the column files, or None if unknown."""
+        slot = _hash(customerid) & self._mask
+        while True:
+            row = int(self._slots[slot])
+            if row < 0:
+                return None
+            if self._ids[row] == customerid:
+                return row
+            slot = (slot + 1) & self._mask
+
+    def lookup(self, customerid, as_of=None):
+        """Form fields for one customer, or None if unknown.
+
+        History fields are always present. age, bank_account_type and
+        employment_status_clients are left out for customers with no
+        demographics record. Age is in whole years at as_of (default: today).
+        """
+        row = self.row(customerid)
+        if row is None:
+            return None
+        record = {col: float(values[row]) for col, values in self._history.items()}
+        birthdate = self._birthdate[row]
+        if not np.isnat(birthdate):
+            as_of = np.datetime64(as_of or "today", "D")
+            record["age"] = float((as_of - birthdate).astype(np.int64) // 365)
+        for col, codes in self._categorical.items():
+            if codes[row] >= 0:
+                record[col] = scoring_core.FIELD_CHOICES[col][codes[row]]
+        return record
+
+
+def load_index(prevloans_path=feature_store.PREVLOANS_PATH, demographics_path=feature_store.DEMOGRAPHICS_PATH,
+               directory=INDEX_DIR):
+    """Open the index, (re)building it first if it is missing or older than the CSVs."""
+    if not index_is_fresh(prevloans_path, demographics_path, directory):
+        build_index(prevloans_path, demographics_path, directory)
+    return CustomerIndex(directory)
+
+
+# --- Checks ---
+def verify(index, prevloans_path=feature_store.PREVLOANS_PATH, demographics_path=feature_store.DEMOGRAPHICS_PATH):
+    """Compare every customer's lookup with feature_store.load_customer_features(); returns mismatches."""
+    expected = feature_store.load_customer_features(prevloans_path, demographics_path)
+    problems = []
+    if len(index) != len(expected):
+        problems.append(f"{len(index)} customers indexed, {len(expected)} expected")
+    for customerid, row in zip(expected.index, expected.to_dict("records")):
+        record = index.lookup(customerid)
+        if record is None:
+            problems.append(f"{customerid}: missing")
+            continue
+        wanted = {col: value for col, value in row.items() if value == value}
+        if record != wanted:
+            problems.append(f"{customerid}: {record} != {wanted}")
+    return problems
+
+
+def benchmark(index, lookups=100000, seed=0):
+    """Mean microseconds per lookup over random known IDs."""
+    ids = np.random.default_rng(seed).choice(np.asarray(index._ids), lookups).tolist()
+    start = time.perf_counter()
+    for customerid in ids:
+        index.lookup(customerid)
+    return (time.perf_counter() - start) / lookups * 1e6
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Per-customer index for pre-filling the scoring form.")
+    parser.add_argument("--index", default=INDEX_DIR, help="index directory")
+    parser.add_argument("--prevloans", default=feature_store.PREVLOANS_PATH)
+    parser.add_argument("--demographics", default=feature_store.DEMOGRAPHICS_PATH)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("build", help="build the index from the loan history CSVs")
+    find = sub.add_parser("lookup", help="print the form fields for one customer")
+    find.add_argument("customerid")
+    sub.add_parser("verify", help="compare every customer against feature_store.py")
+    sub.add_parser("benchmark", help="lookup latency and index size")
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        meta = build_index(args.prevloans, args.demographics, args.index)
+        print(f"Indexed {meta['customers']} customers -> {args.index}")
+        return
+
+    start = time.perf_counter()
+    index = load_index(args.prevloans, args.demographics, args.index)
+    open_ms = (time.perf_counter() - start) * 1000
+    if args.command == "lookup":
+        record = index.lookup(args.customerid)
+        if record is None:
+            print(f"customer {args.customerid} not found")
+            sys.exit(1)
+        print(json.dumps(record, indent=2))
+    elif args.command == "verify":
+        problems = verify(index, args.prevloans, args.demographics)
+        for problem in problems[:20]:
+            print(f"MISMATCH {problem}")
+        if problems:
+            sys.exit(1)
+        print(f"OK: {len(index)} customers match feature_store.py")
+    else:
+        size = sum(os.path.getsize(os.path.join(args.index, name)) for name in os.listdir(args.index))
+        print(f"{len(index)} customers, {size / 1024:.0f} KB on disk, opened in {open_ms:.1f} ms")
+        print(f"lookup: {benchmark(index):.1f} us per customer")
+
+
+if __name__ == "__main__":
+    main()
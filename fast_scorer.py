@@ -0,0 +1,329 @@
+# fast_scorer.py
+"""Pure-NumPy evaluation of the fitted logistic pipeline.
+
+logistic_loan_default.pkl is StandardScaler + OneHotEncoder (ColumnTransformer)
+-> SMOTE -> VarianceThreshold -> LogisticRegression. At prediction time SMOTE
+is a no-op and everything else is linear, so the whole pipeline collapses to
+
+    logit = bias + x_num . weights + sum(category lookup per categorical column)
+
+flatten_pipeline() extracts that representation once, and FastScorer
+evaluates it on column arrays (vectorized) or on a single dict (plain Python
+floats, a few microseconds per call) without touching pandas or sklearn.
+
+The flattened parameters can be saved as a small JSON artifact
+(logistic_loan_default.json). load_artifact() needs only NumPy, so workers
+start without importing sklearn/imblearn or unpickling anything.
+
+Usage:
+    python fast_scorer.py --export [logistic_loan_default.json]
+    python fast_scorer.py --check             # parity and latency against the pickle
+    python fast_scorer.py --startup-report    # cold-start time, pickle vs artifact
+"""
+
+import argparse
+import json
+import math
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+import file_utils
+
+MODEL_PATH = "logistic_loan_default.pkl"
+ARTIFACT_PATH = "logistic_loan_default.json"
+ARTIFACT_FORMAT = "logistic-flat/1"
+
+
+# --- Export ---
+def flatten_pipeline(model):
+    """Extract the fitted parameters of the logistic pipeline as plain arrays.
+
+    Only attribute access is used, so this module never imports sklearn.
+    Scaled and one-hot columns dropped by VarianceThreshold get a zero
+    coefficient, which is equivalent to dropping them.
+    """
+    steps = dict(model.steps)
+    preprocessor = steps["preprocessor"]
+    scaler = preprocessor.named_transformers_["scaled_num"].named_steps["scaler"]
+    encoder = preprocessor.named_transformers_["encoded_cat"].named_steps["encoder"]
+    support = steps["var_thresh"].get_support()
+    classifier = steps["classifier"]
+
+    coef = np.zeros(len(support))
+    coef[support] = classifier.coef_.ravel()
+
+    return {
+        "input_columns": [str(col) for col in model.feature_names_in_],
+        "numeric_columns": [str(col) for col in scaler.feature_names_in_],
+        "mean": np.asarray(scaler.mean_, dtype=float),
+        "scale": np.asarray(scaler.scale_, dtype=float),
+        "categorical_columns": [str(col) for col in encoder.feature_names_in_],
+        "categories": [[str(c) for c in cats] for cats in encoder.categories_],
+        "support": np.asarray(support, dtype=bool),
+        "coef": coef,
+        "intercept": float(classifier.intercept_[0]),
+    }
+
+
+def category_contributions(values, table):
+    """Vectorized category -> contribution lookup.
+
+    One comparison pass per category with a non-zero weight; unknown
+    categories contribute nothing, like handle_unknown="ignore".
+    """
+    values = np.asarray(values)
+    if values.dtype.kind not in "OU":
+        values = values.astype(str)
+    out = np.zeros(values.shape)
+    for category, contribution in table.items():
+        if contribution:
+            out[values == category] = contribution
+    return out
+
+
+class FastScorer:
+    """Evaluates a flattened logistic pipeline; see flatten_pipeline()."""
+
+    def __init__(self, params):
+        self.params = params
+        n_num = len(params["numeric_columns"])
+        coef = np.asarray(params["coef"], dtype=float)
+        mean = np.asarray(params["mean"], dtype=float)
+        scale = np.asarray(params["scale"], dtype=float)
+
+        self.input_columns = list(params["input_columns"])
+        self.numeric_columns = list(params["numeric_columns"])
+        self.categorical_columns = list(params["categorical_columns"])
+
+        # Fold the scaler into the weights: coef * (x - mean) / scale
+        self.weights = coef[:n_num] / scale
+        self.bias = float(params["intercept"] - np.dot(self.weights, mean))
+
+        # One lookup table per categorical column: category -> logit contribution
+        self.category_tables = []
+        offset = n_num
+        for categories in params["categories"]:
+            contributions = coef[offset:offset + len(categories)]
+            self.category_tables.append(dict(zip(categories, contributions.tolist())))
+            offset += len(categories)
+
+        self._weight_pairs = list(zip(self.numeric_columns, self.weights.tolist()))
+        self._category_pairs = list(zip(self.categorical_columns, self.category_tables))
+
+    @classmethod
+    def from_pipeline(cls, model):
+        return cls(flatten_pipeline(model))
+
+    # --- Vectorized path ---
+    def decision_function(self, columns):
+        """Logit of the "good" class for a mapping of column -> array (dict or DataFrame)."""
+        x_num = np.column_stack([np.asarray(columns[col], dtype=float) for col in self.numeric_columns])
+        logit = self.bias + x_num @ self.weights
+        for col, table in self._category_pairs:
+            logit = logit + category_contributions(columns[col], table)
+        return logit
+
+    def predict_proba(self, columns):
+        """Two-column [bad, good] probabilities, like model.predict_proba."""
+        proba_good = self.proba_good(columns)
+        return np.column_stack([1.0 - proba_good, proba_good])
+
+    def proba_good(self, columns):
+        logit = self.decision_function(columns)
+        return 1.0 / (1.0 + np.exp(-logit))
+
+    # --- Single-row path ---
+    def proba_one(self, row):
+        """Probability of the "good" class for one applicant dict of model input columns."""
+        logit = self.bias
+        for col, weight in self._weight_pairs:
+            logit += weight * row[col]
+        for col, table in self._category_pairs:
+            logit += table.get(row[col], 0.0)
+        if logit >= 0:
+            return 1.0 / (1.0 + math.exp(-logit))
+        z = math.exp(logit)
+        return z / (1.0 + z)
+
+
+def scorer_for(model):
+    """A FastScorer for a logistic pipeline or FastScorer, or None for other backends."""
+    if isinstance(model, FastScorer):
+        return model
+    steps = getattr(model, "named_steps", {})
+    if "classifier" in steps and hasattr(steps["classifier"], "coef_"):
+        return FastScorer.from_pipeline(model)
+    return None
+
+
+# --- Artifact ---
+def save_artifact(params, path=ARTIFACT_PATH, source=None):
+    """Write flattened parameters as JSON. Floats round-trip exactly through repr."""
+    artifact = {
+        "format": ARTIFACT_FORMAT,
+        "params": {key: value.tolist() if isinstance(value, np.ndarray) else value for key, value in params.items()},
+    }
+    if source is not None:
+        artifact["source"] = {"path": source, "sha256": file_utils.file_sha256(source)}
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(artifact, f, indent=1)
+    os.replace(tmp_path, path)
+
+
+def load_artifact(path=ARTIFACT_PATH):
+    """Build a FastScorer from a JSON artifact written by save_artifact()."""
+    with open(path) as f:
+        artifact = json.load(f)
+    if artifact.get("format") != ARTIFACT_FORMAT:
+        raise ValueError(f"{path} is not a {ARTIFACT_FORMAT} artifact")
+    params = dict(artifact["params"])
+    for key in ("mean", "scale", "coef"):
+        params[key] = np.asarray(params[key], dtype=float)
+    params["support"] = np.asarray(params["support"], dtype=bool)
+    return FastScorer(params)
+
+
+def load_model(path):
+    """Load a JSON artifact with NumPy only, or fall back to joblib for a pickled pipeline.
+
+    Both results expose predict_proba on a frame of FEATURE_COLUMNS.
+    """
+    if path.endswith(".json"):
+        return load_artifact(path)
+    import joblib
+
+    return joblib.load(path)
+
+
+# --- Parity check ---
+def parity_frame(n_random=100000, seed=0):
+    """Feature frame of the training applicants followed by n_random perturbed ones.
+
+    The perturbed rows scale every numeric input by 0.5-1.5 and include
+    categories the model never saw, so both one-hot edge cases are covered.
+    """
+    import pandas as pd
+
+    import batch_scoring
+    import feature_store
+    import scoring_core
+
+    frame = feature_store.load_training_frame()
+    real = batch_scoring.feature_frame(frame[scoring_core.INPUT_COLUMNS])
+    rng = np.random.default_rng(seed)
+    random = real.sample(n_random, replace=True, random_state=seed).reset_index(drop=True)
+    for col in scoring_core.NUMERIC_INPUTS:
+        random[col] = random[col] * rng.uniform(0.5, 1.5, n_random)
+    random.loc[::97, "employment_status_clients"] = "Freelance"
+    random.loc[::89, "bank_account_type"] = "Domiciliary"
+    return pd.concat([real, batch_scoring.feature_frame(random[scoring_core.INPUT_COLUMNS])], ignore_index=True)
+
+
+def _check(model_path, n_random=100000, tolerance=1e-9, artifact_path=None):
+    import timeit
+
+    import joblib
+
+    model = joblib.load(model_path)
+    scorer = FastScorer.from_pipeline(model)
+    applicants = parity_frame(n_random)
+
+    expected = model.predict_proba(applicants)[:, 1]
+    vectorized = scorer.proba_good(applicants)
+    records = applicants.head(5000).to_dict("records")
+    single = np.array([scorer.proba_one(record) for record in records])
+
+    max_diff = np.abs(vectorized - expected).max()
+    max_diff_single = np.abs(single - expected[:len(single)]).max()
+    print(f"rows checked: {len(applicants)}")
+    print(f"max |fast - pipeline|, vectorized: {max_diff:.3e}")
+    print(f"max |fast - pipeline|, single-row: {max_diff_single:.3e}")
+    if artifact_path is not None and os.path.exists(artifact_path):
+        max_diff_artifact = np.abs(load_artifact(artifact_path).proba_good(applicants) - expected).max()
+        print(f"max |{artifact_path} - pipeline|: {max_diff_artifact:.3e}")
+        max_diff = max(max_diff, max_diff_artifact)
+
+    one_df = applicants.head(1)
+    one_record = records[0]
+    n = 200
+    pipeline_us = timeit.timeit(lambda: model.predict_proba(one_df), number=n) / n * 1e6
+    n = 100000
+    fast_us = timeit.timeit(lambda: scorer.proba_one(one_record), number=n) / n * 1e6
+    print(f"single-row latency: pipeline {pipeline_us:,.1f} us, fast path {fast_us:,.2f} us "
+          f"({pipeline_us / fast_us:,.0f}x)")
+
+    if max(max_diff, max_diff_single) > tolerance:
+        print(f"FAIL: difference exceeds {tolerance:g}")
+        return False
+    print(f"OK: within {tolerance:g}")
+    return True
+
+
+# --- Startup report ---
+STARTUP_SNIPPETS = {
+    "pickle (joblib + imblearn pipeline)": (
+        "import joblib; model = joblib.load({model!r})"
+    ),
+    "json artifact (numpy only)": (
+        "import fast_scorer; model = fast_scorer.load_artifact({artifact!r})"
+    ),
+}
+
+
+def startup_report(model_path=MODEL_PATH, artifact_path=ARTIFACT_PATH, repeats=5):
+    """Time a cold interpreter loading each format, best of repeats."""
+    results = {}
+    for label, snippet in STARTUP_SNIPPETS.items():
+        code = (
+            "import sys, time; t = time.perf_counter(); "
+            + snippet.format(model=model_path, artifact=artifact_path)
+            + "; print((time.perf_counter() - t) * 1000, len(sys.modules), 'sklearn' in sys.modules)"
+        )
+        runs = []
+        for _ in range(repeats):
+            out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+            elapsed, n_modules, sklearn_loaded = out.stdout.split()
+            runs.append(float(elapsed))
+        results[label] = {"ms": min(runs), "modules": int(n_modules), "sklearn_imported": sklearn_loaded == "True"}
+
+    sizes = {"pickle (joblib + imblearn pipeline)": model_path, "json artifact (numpy only)": artifact_path}
+    print(f"{'format':38s} {'load ms':>10s} {'modules':>8s} {'size KB':>8s}  sklearn")
+    for label, result in results.items():
+        size_kb = os.path.getsize(sizes[label]) / 1024
+        print(f"{label:38s} {result['ms']:10.1f} {result['modules']:8d} {size_kb:8.1f}  {result['sklearn_imported']}")
+    pickle_ms, artifact_ms = (result["ms"] for result in results.values())
+    print(f"speed-up: {pickle_ms / artifact_ms:.0f}x")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fast NumPy scorer for the logistic pipeline.")
+    parser.add_argument("--model", default=MODEL_PATH, help="pickled pipeline")
+    parser.add_argument("--export", nargs="?", const=ARTIFACT_PATH, metavar="PATH",
+                        help="write the JSON artifact (default: %(const)s)")
+    parser.add_argument("--check", action="store_true", help="compare against model.predict_proba and time both")
+    parser.add_argument("--startup-report", action="store_true", help="compare cold-start time of both formats")
+    parser.add_argument("--artifact", default=ARTIFACT_PATH, help="artifact used by --check and --startup-report")
+    args = parser.parse_args(argv)
+
+    if not (args.export or args.check or args.startup_report):
+        parser.print_help()
+        return
+    if args.export:
+        import joblib
+
+        save_artifact(flatten_pipeline(joblib.load(args.model)), args.export, source=args.model)
+        print(f"Wrote {args.export} ({os.path.getsize(args.export) / 1024:.1f} KB)")
+    if args.check and not _check(args.model, artifact_path=args.artifact):
+        sys.exit(1)
+    if args.startup_report:
+        startup_report(args.model, args.artifact)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+# feature_store.py
+"""Per-customer model features derived from the raw loan history CSVs.
+
+The app's "Payment History" and "Financial History" inputs are aggregates of
+a customer's previous loans. This module computes them for every customer in
+one vectorized groupby pass over trainprevloans.csv, joins the profile fields
+from traindemographics.csv, and lets callers look a customer up by ID.
+
+A loan's repayment ratio is totaldue / loanamount (amount due per unit
+borrowed) everywhere: avg_prev_repayment_ratio averages it over previous
+loans and repayment_curr_ratio is the same ratio for the current loan, so
+repayment_efficiency (their quotient) is 1 when a customer's terms are
+unchanged.
+
+Usage:
+    python feature_store.py [--output customer_features.csv]
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+import ingest
+
+PREVLOANS_PATH = "trainprevloans.csv"
+PERF_PATH = "trainperf.csv"
+DEMOGRAPHICS_PATH = "traindemographics.csv"
+
+HISTORY_FEATURES = [
+    "num_prev_loans",
+    "avg_repay_delay_days",
+    "total_firstrepaid_late",
+    "avg_prev_repayment_ratio",
+    "avg_duration_days",
+    "avg_prev_interest",
+]
+PROFILE_FEATURES = ["age", "bank_account_type", "employment_status_clients"]
+
+
+# --- Loading ---
+# Typed frames from ingest.py's memory-mapped cache; each CSV is parsed only when it changes
+def load_prevloans(path=PREVLOANS_PATH):
+    return ingest.load_table(path, ingest.PREVLOANS_SCHEMA)
+
+
+def load_perf(path=PERF_PATH):
+    return ingest.load_table(path, ingest.PERF_SCHEMA)
+
+
+def load_demographics(path=DEMOGRAPHICS_PATH):
+    demographics = ingest.load_table(path, ingest.DEMOGRAPHICS_SCHEMA)
+    # A handful of customers appear twice; keep the first record like the training merge did
+    return demographics.drop_duplicates("customerid", keep="first")
+
+
+# --- Aggregation ---
+def repayment_ratio(loans):
+    """totaldue / loanamount per loan: the one repayment ratio for previous and current loans."""
+    return loans["totaldue"] / loans["loanamount"]
+
+
+def loan_level_features(prevloans):
+    """Per-loan quantities that the customer aggregates are built from."""
+    delay_days = (prevloans["firstrepaiddate"] - prevloans["firstduedate"]).dt.days
+    return pd.DataFrame({
+        "customerid": prevloans["customerid"].to_numpy(),
+        "repay_delay_days": delay_days.to_numpy(dtype=float),
+        "firstrepaid_late": (delay_days > 0).to_numpy(dtype=np.int64),
+        "repayment_ratio": repayment_ratio(prevloans).to_numpy(),
+        "duration_days": (prevloans["closeddate"] - prevloans["approveddate"]).dt.days.to_numpy(dtype=float),
+        "interest": (prevloans["totaldue"] - prevloans["loanamount"]).to_numpy(),
+    })
+
+
+def history_features(prevloans):
+    """Aggregate previous loans into one row of HISTORY_FEATURES per customerid."""
+    loans = loan_level_features(prevloans)
+    history = loans.groupby("customerid", sort=True).agg(
+        num_prev_loans=("repay_delay_days", "size"),
+        avg_repay_delay_days=("repay_delay_days", "mean"),
+        total_firstrepaid_late=("firstrepaid_late", "sum"),
+        avg_prev_repayment_ratio=("repayment_ratio", "mean"),
+        avg_duration_days=("duration_days", "mean"),
+        avg_prev_interest=("interest", "mean"),
+    )
+    return history.astype(float)
+
+
+def age_in_years(birthdate, as_of):
+    """Whole years between birthdate and as_of, as used when the model was trained."""
+    return ((as_of - birthdate).dt.days // 365).astype(float)
+
+
+def profile_features(demographics, as_of=None):
+    """Age and categorical profile fields per customerid.
+
+    as_of is a Series of reference dates aligned with demographics (or a single
+    timestamp); it defaults to today.
+    """
+    if as_of is None:
+        as_of = pd.Timestamp.now().normalize()
+    profile = pd.DataFrame({
+        "age": age_in_years(demographics["birthdate"], as_of).to_numpy(),
+        "bank_account_type": demographics["bank_account_type"].astype(object).fillna("Other").to_numpy(),
+        "employment_status_clients": demographics["employment_status_clients"].astype(object).fillna("Unknown").to_numpy(),
+    }, index=pd.Index(demographics["customerid"].to_numpy(), name="customerid"))
+    return profile
+
+
+def build_customer_features(prevloans, demographics, as_of=None):
+    """One row per customer with every aggregate the model form asks for.
+
+    Customers with no previous loans get zeros for the history features, which
+    is how the training data treated first-time borrowers.
+    """
+    history = history_features(prevloans)
+    profile = profile_features(demographics, as_of=as_of)
+    customers = profile.join(history, how="outer")
+    customers[HISTORY_FEATURES] = customers[HISTORY_FEATURES].fillna(0.0)
+    return customers[HISTORY_FEATURES + PROFILE_FEATURES]
+
+
+def build_training_frame(perf, prevloans, demographics):
+    """Model inputs for every loan in trainperf.csv, plus the good_bad_flag label.
+
+    Age is measured at the loan's approval date, and repayment_curr_ratio is
+    repayment_ratio() of the current loan.
+    """
+    frame = perf.merge(demographics, on="customerid", how="inner")
+    history = history_features(prevloans)
+    frame = frame.merge(history, left_on="customerid", right_index=True, how="left")
+    frame[HISTORY_FEATURES] = frame[HISTORY_FEATURES].fillna(0.0)
+
+    frame["age"] = age_in_years(frame["birthdate"], frame["approveddate"])
+    # Categorical columns from ingest.py become plain strings, as the model saw them in training
+    frame["bank_account_type"] = frame["bank_account_type"].astype(object).fillna("Other")
+    frame["employment_status_clients"] = frame["employment_status_clients"].astype(object).fillna("Unknown")
+    frame["repayment_curr_ratio"] = repayment_ratio(frame)
+    frame["target"] = (frame["good_bad_flag"] == "Good").astype(np.int64)
+    return frame
+
+
+def load_customer_features(prevloans_path=PREVLOANS_PATH, demographics_path=DEMOGRAPHICS_PATH, as_of=None):
+    return build_customer_features(load_prevloans(prevloans_path), load_demographics(demographics_path), as_of=as_of)
+
+
+def load_training_frame(perf_path=PERF_PATH, prevloans_path=PREVLOANS_PATH, demographics_path=DEMOGRAPHICS_PATH):
+    return build_training_frame(load_perf(perf_path), load_prevloans(prevloans_path), load_demographics(demographics_path))
+
+
+# --- Lookup ---
+def lookup_customer(customers, customerid):
+    """Return the feature dict for one customer, or None if unknown."""
+    if customerid not in customers.index:
+        return None
+    return customers.loc[customerid].to_dict()
+
+
+def fill_from_store(applicants, customers, key="customerid"):
+    """Fill missing aggregate columns of an applicant frame from the store by customerid."""
+    columns = [col for col in HISTORY_FEATURES + PROFILE_FEATURES if col not in applicants.columns]
+    if not columns:
+        return applicants
+    looked_up = customers[columns].reindex(applicants[key].to_numpy())
+    looked_up.index = applicants.index
+    return pd.concat([applicants, looked_up], axis=1)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build per-customer model features from the loan history CSVs.")
+    parser.add_argument("--prevloans", default=PREVLOANS_PATH)
+    parser.add_argument("--demographics", default=DEMOGRAPHICS_PATH)
+    parser.add_argument("--output", default="customer_features.csv")
+    args = parser.parse_args(argv)
+
+    customers = load_customer_features(args.prevloans, args.demographics)
+    customers.to_csv(args.output)
+    print(f"Wrote features for {len(customers)} customers -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+# file_utils.py
+"""Small file helpers shared by the caches, indexes and artifact modules.
+
+file_sha256() is the one content hash for model files and artifacts: the
+audit log's model version, registry checksums, score-mapping model checks and
+artifact sources all compare its output.
+
+replace_directory() swaps a freshly built directory into place. The old
+directory is renamed aside first and deleted only after the new one is in
+place, so no reader ever sees it half-deleted.
+"""
+
+import hashlib
+import os
+import shutil
+import tempfile
+
+MAX_REPLACE_ATTEMPTS = 10
+
+
+def file_sha256(path):
+    """SHA-256 hex digest of a file's contents, read in blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def replace_directory(src, dst):
+    """Move the directory src to dst, replacing dst if it exists.
+
+    Both renames are atomic, so dst always holds either the complete old
+    directory or the complete new one. The only exception is the instant
+    between the two renames, when dst does not exist. If another writer puts
+    its own copy at dst in that instant, that copy is moved aside as well and
+    src wins.
+    """
+    parent = os.path.dirname(os.path.abspath(dst))
+    trash = tempfile.mkdtemp(prefix=".old-", dir=parent)
+    try:
+        for attempt in range(MAX_REPLACE_ATTEMPTS):
+            try:
+                os.rename(dst, os.path.join(trash, str(attempt)))
+            except FileNotFoundError:
+                pass
+            try:
+                os.rename(src, dst)
+                return
+            except OSError:
+                if not os.path.exists(dst):
+                    raise
+        raise OSError(f"could not replace {dst}: other writers kept recreating it")
+    finally:
+        shutil.rmtree(trash, ignore_errors=True)
@@ -0,0 +1,324 @@
+# incremental_store.py
+"""Running per-customer loan aggregates that are updated as new loans close.
+
+Instead of re-averaging a customer's whole history on every refresh, the
+store keeps running sums and counts per customerid and folds in only the
+newly closed loans. Means are derived from the sums on read, so they come out
+the same as feature_store.history_features() on the full history.
+
+The store lives in a directory of .npy column files plus a small meta.json,
+and is memory-mapped on load so a restart does not replay any history.
+
+append() is idempotent: the store records the systemloanid of every loan it
+has folded in and skips loans it has already applied, so a retried or re-run
+ingest job cannot count a loan twice. The IDs are kept as a sorted array
+(applied_loans.npy, memory-mapped like the columns); an append binary-searches
+it for the new batch only, and save() merges the batch's IDs in. The customerid
+column widens to the longest ID seen, so long IDs are never truncated.
+
+Usage:
+    python incremental_store.py build  --store customer_store [--prevloans trainprevloans.csv]
+    python incremental_store.py append --store customer_store new_loans.csv
+    python incremental_store.py verify --store customer_store [--prevloans trainprevloans.csv]
+"""
+
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+import feature_store
+
+STORE_DIR = "customer_store"
+ID_DTYPE = "U32"  # initial width; widened when a longer customerid arrives
+LOAN_ID = "systemloanid"
+
+# Running totals kept per customer. Integer totals are exact; float totals
+# can differ from a one-shot recompute only by summation order.
+SUM_COLUMNS = {
+    "loan_count": np.int64,
+    "repay_delay_days_sum": np.int64,
+    "firstrepaid_late_count": np.int64,
+    "repayment_ratio_sum": np.float64,
+    "duration_days_sum": np.int64,
+    "interest_sum": np.float64,
+}
+
+# Float comparison tolerance used by verify()
+FLOAT_RTOL = 1e-12
+
+
+def loan_sums(prevloans):
+    """Per-customer partial sums for a batch of closed loans."""
+    loans = feature_store.loan_level_features(prevloans)
+    sums = loans.groupby("customerid", sort=False).agg(
+        loan_count=("repay_delay_days", "size"),
+        repay_delay_days_sum=("repay_delay_days", "sum"),
+        firstrepaid_late_count=("firstrepaid_late", "sum"),
+        repayment_ratio_sum=("repayment_ratio", "sum"),
+        duration_days_sum=("duration_days", "sum"),
+        interest_sum=("interest", "sum"),
+    )
+    return sums.astype(SUM_COLUMNS)
+
+
+class AggregateStore:
+    """Running loan aggregates keyed by customerid.
+
+    Columns are preallocated with spare capacity and grown by doubling, so
+    append() costs O(new loans) amortized.
+    """
+
+    def __init__(self, capacity=1024):
+        self._positions = {}
+        self._size = 0
+        self.loans_applied = 0
+        self._applied_loans = np.empty(0, dtype=np.int64)  # sorted; memory-mapped after load()
+        self._new_loans = set()  # applied since the last load() or save()
+        self._directory = None  # where _applied_loans is stored
+        self._ids = np.empty(capacity, dtype=ID_DTYPE)
+        self._sums = {name: np.zeros(capacity, dtype=dtype) for name, dtype in SUM_COLUMNS.items()}
+
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, customerid):
+        return customerid in self._positions
+
+    @classmethod
+    def from_prevloans(cls, prevloans):
+        store = cls(capacity=max(1024, prevloans["customerid"].nunique()))
+        store.append(prevloans)
+        return store
+
+    # --- Updates ---
+    def _was_applied(self, loan_ids):
+        """Mask of loan_ids already folded in: a binary search per ID, plus this session's set."""
+        applied = self._applied_loans
+        found = np.zeros(len(loan_ids), dtype=bool)
+        if len(applied):
+            at = np.minimum(np.searchsorted(applied, loan_ids), len(applied) - 1)
+            found = applied[at] == loan_ids
+        if self._new_loans:
+            found |= np.fromiter((loan_id in self._new_loans for loan_id in loan_ids.tolist()),
+                                 dtype=bool, count=len(loan_ids))
+        return found
+
+    def _widen_ids(self, ids):
+        width = max((len(cid) for cid in ids.tolist()), default=0)
+        if width > self._ids.dtype.itemsize // 4:
+            self._ids = self._ids.astype(f"U{width}")
+
+    def _grow(self, needed):
+        capacity = len(self._ids)
+        if needed <= capacity:
+            return
+        capacity = max(capacity, 1)  # a loaded empty store has no spare capacity
+        while capacity < needed:
+            capacity *= 2
+        ids = np.empty(capacity, dtype=self._ids.dtype)
+        ids[:self._size] = self._ids[:self._size]
+        self._ids = ids
+        for name, column in self._sums.items():
+            grown = np.zeros(capacity, dtype=column.dtype)
+            grown[:self._size] = column[:self._size]
+            self._sums[name] = grown
+
+    def append(self, new_loans):
+        """Fold a batch of newly closed loans (trainprevloans.csv schema) into the store.
+
+        Loans whose systemloanid was applied before, or that repeat within the
+        batch, are skipped. Returns the number of loans folded in.
+        """
+        if len(new_loans) == 0:
+            return 0
+        loan_ids = new_loans[LOAN_ID]
+        if loan_ids.isna().any():
+            raise ValueError(f"{int(loan_ids.isna().sum())} loans have no {LOAN_ID}")
+        loan_ids = loan_ids.to_numpy(dtype=np.int64)
+        fresh = ~pd.Series(loan_ids).duplicated().to_numpy()
+        fresh &= ~self._was_applied(loan_ids)
+        if not fresh.all():
+            new_loans, loan_ids = new_loans[fresh], loan_ids[fresh]
+            if len(new_loans) == 0:
+                return 0
+        sums = loan_sums(new_loans)
+        ids = sums.index.to_numpy()
+
+        positions = np.fromiter((self._positions.get(cid, -1) for cid in ids), dtype=np.int64, count=len(ids))
+        unseen = positions < 0
+        n_new = int(unseen.sum())
+        if n_new:
+            self._widen_ids(ids[unseen])
+            self._grow(self._size + n_new)
+            new_positions = np.arange(self._size, self._size + n_new)
+            self._ids[new_positions] = ids[unseen]
+            self._positions.update(zip(ids[unseen], new_positions.tolist()))
+            positions[unseen] = new_positions
+            self._size += n_new
+
+        for name in SUM_COLUMNS:
+            # positions are unique within one batch, so a fancy-indexed add is safe
+            self._sums[name][positions] += sums[name].to_numpy()
+        self._new_loans.update(loan_ids.tolist())
+        self.loans_applied += len(new_loans)
+        return len(new_loans)
+
+    # --- Reads ---
+    def sums(self):
+        """The raw running totals as a DataFrame indexed by customerid."""
+        index = pd.Index(self._ids[:self._size], name="customerid")
+        return pd.DataFrame({name: column[:self._size] for name, column in self._sums.items()}, index=index)
+
+    def history_features(self):
+        """Same frame as feature_store.history_features(), derived from the running sums."""
+        sums = self.sums().sort_index()
+        count = sums["loan_count"].to_numpy(dtype=float)
+        history = pd.DataFrame({
+            "num_prev_loans": count,
+            "avg_repay_delay_days": sums["repay_delay_days_sum"].to_numpy() / count,
+            "total_firstrepaid_late": sums["firstrepaid_late_count"].to_numpy(dtype=float),
+            "avg_prev_repayment_ratio": sums["repayment_ratio_sum"].to_numpy() / count,
+            "avg_duration_days": sums["duration_days_sum"].to_numpy() / count,
+            "avg_prev_interest": sums["interest_sum"].to_numpy() / count,
+        }, index=sums.index)
+        return history
+
+    def lookup(self, customerid):
+        """History features for one customer, or None if the customer has no closed loans."""
+        position = self._positions.get(customerid)
+        if position is None:
+            return None
+        count = float(self._sums["loan_count"][position])
+        return {
+            "num_prev_loans": count,
+            "avg_repay_delay_days": self._sums["repay_delay_days_sum"][position] / count,
+            "total_firstrepaid_late": float(self._sums["firstrepaid_late_count"][position]),
+            "avg_prev_repayment_ratio": self._sums["repayment_ratio_sum"][position] / count,
+            "avg_duration_days": self._sums["duration_days_sum"][position] / count,
+            "avg_prev_interest": self._sums["interest_sum"][position] / count,
+        }
+
+    # --- Persistence ---
+    def save(self, directory=STORE_DIR):
+        """Write one .npy file per column; files are replaced atomically."""
+        os.makedirs(directory, exist_ok=True)
+        columns = {"customerid": self._ids[:self._size]}
+        columns.update({name: column[:self._size] for name, column in self._sums.items()})
+        if self._new_loans or self._directory != os.path.abspath(directory):
+            new = np.sort(np.fromiter(self._new_loans, dtype=np.int64, count=len(self._new_loans)))
+            # Both sides are sorted and disjoint, so inserting at the search positions keeps the order
+            columns["applied_loans"] = np.insert(self._applied_loans, np.searchsorted(self._applied_loans, new), new)
+        for name, values in columns.items():
+            tmp_path = os.path.join(directory, f"{name}.npy.tmp")
+            with open(tmp_path, "wb") as f:
+                np.save(f, values)
+            os.replace(tmp_path, os.path.join(directory, f"{name}.npy"))
+
+        meta = {"customers": self._size, "loans_applied": self.loans_applied, "columns": list(SUM_COLUMNS)}
+        tmp_path = os.path.join(directory, "meta.json.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(meta, f, indent=2)
+        os.replace(tmp_path, os.path.join(directory, "meta.json"))
+        if "applied_loans" in columns:
+            self._applied_loans = columns["applied_loans"]
+            self._new_loans = set()
+            self._directory = os.path.abspath(directory)
+
+    @classmethod
+    def load(cls, directory=STORE_DIR):
+        """Memory-map a saved store. Columns are copy-on-write until the first append grows them."""
+        with open(os.path.join(directory, "meta.json")) as f:
+            meta = json.load(f)
+
+        store = cls.__new__(cls)
+        store._size = meta["customers"]
+        store.loans_applied = meta["loans_applied"]
+        store._ids = np.load(os.path.join(directory, "customerid.npy"), mmap_mode="c")
+        store._sums = {
+            name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="c")
+            for name in SUM_COLUMNS
+        }
+        store._positions = dict(zip(store._ids.tolist(), range(store._size)))
+        applied_path = os.path.join(directory, "applied_loans.npy")
+        if not os.path.exists(applied_path):
+            raise ValueError(f"{directory} has no applied_loans.npy (built before loan IDs were tracked); "
+                             f"rebuild it with 'python incremental_store.py build'")
+        store._applied_loans = np.load(applied_path, mmap_mode="r")
+        store._new_loans = set()
+        store._directory = os.path.abspath(directory)
+        return store
+
+
+def verify(store, prevloans):
+    """Compare the store against a full recompute over prevloans.
+
+    Returns a list of mismatch descriptions; an empty list means they agree.
+    """
+    expected = feature_store.history_features(prevloans)
+    actual = store.history_features()
+
+    problems = []
+    if not actual.index.equals(expected.index):
+        missing = expected.index.difference(actual.index)
+        extra = actual.index.difference(expected.index)
+        problems.append(f"customer sets differ: {len(missing)} missing, {len(extra)} unexpected")
+        common = expected.index.intersection(actual.index)
+        expected, actual = expected.loc[common], actual.loc[common]
+
+    for column in expected.columns:
+        exp = expected[column].to_numpy()
+        act = actual[column].to_numpy()
+        if column in ("avg_prev_repayment_ratio", "avg_prev_interest"):
+            bad = ~np.isclose(act, exp, rtol=FLOAT_RTOL, atol=0.0)
+        else:
+            bad = act != exp
+        if bad.any():
+            problems.append(f"{column}: {int(bad.sum())} customers differ")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain incremental per-customer loan aggregates.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("build", help="create the store from a full loan history")
+    build.add_argument("--prevloans", default=feature_store.PREVLOANS_PATH)
+
+    append = sub.add_parser("append", help="fold newly closed loans into the store")
+    append.add_argument("new_loans", help="CSV of closed loans in the trainprevloans.csv schema")
+
+    check = sub.add_parser("verify", help="check the store against a full recompute")
+    check.add_argument("--prevloans", default=feature_store.PREVLOANS_PATH)
+
+    for command in (build, append, check):
+        command.add_argument("--store", default=STORE_DIR, help="store directory")
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        store = AggregateStore.from_prevloans(feature_store.load_prevloans(args.prevloans))
+        store.save(args.store)
+        print(f"Built store for {len(store)} customers from {store.loans_applied} loans -> {args.store}")
+    elif args.command == "append":
+        store = AggregateStore.load(args.store)
+        before = len(store)
+        new_loans = feature_store.load_prevloans(args.new_loans)
+        applied = store.append(new_loans)
+        store.save(args.store)
+        print(f"Appended {applied} loans ({len(new_loans) - applied} already applied, skipped): "
+              f"{len(store) - before} new customers, {len(store)} total")
+    else:
+        store = AggregateStore.load(args.store)
+        problems = verify(store, feature_store.load_prevloans(args.prevloans))
+        if problems:
+            for problem in problems:
+                print(f"MISMATCH {problem}")
+            sys.exit(1)
+        print(f"OK: {len(store)} customers match a full recompute")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+# ingest.py
+"""Typed loading of the loan history CSVs with a memory-mapped columnar cache.
+
+Each CSV is parsed once with an explicit schema:
+
+- IDs and counts as int64
+- amounts and coordinates as float64
+- dates as datetime64[ns], parsed with their fixed format instead of being inferred
+- repeated strings (customerid, bank and employment fields, labels) as categoricals
+
+The parsed columns are written to <cache dir>/<file name>-<path hash>/ as
+one .npy file per column. Categoricals are stored as an integer codes file
+plus a categories file. Later loads memory-map these files instead of
+re-parsing text. The directory name includes a hash of the CSV's absolute
+path, so two files with the same name never share a cache. The cache
+records the source path, size and modification time, and is rebuilt
+whenever the CSV changes.
+
+Usage:
+    python ingest.py build                 # parse all three CSVs into the cache
+    python ingest.py report [--repeat 1]   # load time and RSS: pd.read_csv vs cache build vs cached load
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+import file_utils
+import prediction_cache
+
+CACHE_DIR = ".ingest_cache"
+CACHE_FORMAT = "columns/1"
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+
+PREVLOANS_SCHEMA = {
+    "customerid": "category",
+    "systemloanid": "int64",
+    "loannumber": "int64",
+    "approveddate": "datetime",
+    "creationdate": "datetime",
+    "loanamount": "float64",
+    "totaldue": "float64",
+    "termdays": "int64",
+    "closeddate": "datetime",
+    "referredby": "category",
+    "firstduedate": "datetime",
+    "firstrepaiddate": "datetime",
+}
+PERF_SCHEMA = {
+    "customerid": "category",
+    "systemloanid": "int64",
+    "loannumber": "int64",
+    "approveddate": "datetime",
+    "creationdate": "datetime",
+    "loanamount": "float64",
+    "totaldue": "float64",
+    "termdays": "int64",
+    "referredby": "category",
+    "good_bad_flag": "category",
+}
+DEMOGRAPHICS_SCHEMA = {
+    "customerid": "category",
+    "birthdate": "datetime",
+    "bank_account_type": "category",
+    "longitude_gps": "float64",
+    "latitude_gps": "float64",
+    "bank_name_clients": "category",
+    "bank_branch_clients": "category",
+    "employment_status_clients": "category",
+    "level_of_education_clients": "category",
+}
+SCHEMAS = {
+    "trainprevloans.csv": PREVLOANS_SCHEMA,
+    "trainperf.csv": PERF_SCHEMA,
+    "traindemographics.csv": DEMOGRAPHICS_SCHEMA,
+}
+
+
+# --- Parsing ---
+def read_typed_csv(path, schema):
+    """Parse a CSV into a frame with exactly the schema's columns and dtypes."""
+    header = pd.read_csv(path, nrows=0).columns
+    missing = [col for col in schema if col not in header]
+    if missing:
+        raise ValueError(f"{path} is missing columns: {', '.join(missing)}")
+
+    dtypes = {col: (str if kind == "datetime" else kind) for col, kind in schema.items()}
+    frame = pd.read_csv(path, usecols=list(schema), dtype=dtypes)
+    for col, kind in schema.items():
+        if kind == "datetime":
+            frame[col] = pd.to_datetime(frame[col], format=DATE_FORMAT).astype("datetime64[ns]")
+    return frame[list(schema)]
+
+
+# --- Cache ---
+def cache_path(path, cache_dir=CACHE_DIR):
+    """Cache directory of one CSV: its file name plus a hash of its absolute path."""
+    source = os.path.abspath(path)
+    digest = hashlib.sha1(source.encode()).hexdigest()[:12]
+    return os.path.join(cache_dir, f"{os.path.basename(source)}-{digest}")
+
+
+def _write_cache(frame, schema, source, directory):
+    """Write one .npy per column (codes + categories for categoricals) and meta.json, then swap the directory in."""
+    parent = os.path.dirname(directory) or "."
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix=".tmp-", dir=parent)
+    for col, kind in schema.items():
+        if kind == "category":
+            np.save(os.path.join(tmp_dir, f"{col}.codes.npy"), frame[col].cat.codes.to_numpy())
+            np.save(os.path.join(tmp_dir, f"{col}.categories.npy"), frame[col].cat.categories.to_numpy(dtype=str))
+        else:
+            np.save(os.path.join(tmp_dir, f"{col}.npy"), frame[col].to_numpy(dtype=frame[col].dtype))
+    size, mtime_ns = prediction_cache.file_fingerprint(source)
+    meta = {
+        "format": CACHE_FORMAT,
+        "source": os.path.abspath(source),
+        "source_size": size,
+        "source_mtime_ns": mtime_ns,
+        "rows": int(len(frame)),
+        "schema": schema,
+    }
+    with open(os.path.join(tmp_dir, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=2)
+    file_utils.replace_directory(tmp_dir, directory)
+
+
+def _cache_is_fresh(path, schema, directory):
+    try:
+        with open(os.path.join(directory, "meta.json")) as f:
+            meta = json.load(f)
+        size, mtime_ns = prediction_cache.file_fingerprint(path)
+    except (OSError, ValueError):
+        return False
+    return (meta.get("format") == CACHE_FORMAT and meta.get("schema") == schema
+            and meta.get("source") == os.path.abspath(path) and meta.get("source_size") == size and meta.get("source_mtime_ns") == mtime_ns)
+
+
+def _read_cache(schema, directory):
+    """Frame over memory-mapped column files; nothing is parsed or copied up front."""
+    columns = {}
+    for col, kind in schema.items():
+        if kind == "category":
+            codes = np.load(os.path.join(directory, f"{col}.codes.npy"), mmap_mode="r")
+            categories = np.load(os.path.join(directory, f"{col}.categories.npy"))
+            columns[col] = pd.Categorical.from_codes(codes, categories=categories.astype(object), validate=False)
+        else:
+            columns[col] = np.load(os.path.join(directory, f"{col}.npy"), mmap_mode="r")
+    return pd.DataFrame(columns, copy=False)
+
+
+def load_table(path, schema=None, cache_dir=CACHE_DIR):
+    """Typed frame for a CSV, from the cache when it matches the file, else parsed and cached."""
+    schema = schema or SCHEMAS[os.path.basename(path)]
+    directory = cache_path(path, cache_dir)
+    if not _cache_is_fresh(path, schema, directory):
+        _write_cache(read_typed_csv(path, schema), schema, path, directory)
+    return _read_cache(schema, directory)
+
+
+# --- Report ---
+_MEASURE = """
+import os, sys, time
+sys.path.insert(0, {root!r})
+import numpy as np, pandas as pd
+import ingest
+
+def rss_mb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+before = rss_mb()
+start = time.perf_counter()
+{statement}
+print(time.perf_counter() - start, rss_mb() - before)
+"""
+
+METHODS = {
+    "pd.read_csv (parse_dates)": "frame = pd.read_csv({path!r}, parse_dates={dates!r})",
+    "typed parse + cache build": "frame = ingest.load_table({path!r}, ingest.SCHEMAS[{name!r}], cache_dir={cache!r})",
+    "cached load (memory-mapped)": "frame = ingest.load_table({path!r}, ingest.SCHEMAS[{name!r}], cache_dir={cache!r})",
+    "cached load + read all columns": (
+        "frame = ingest.load_table({path!r}, ingest.SCHEMAS[{name!r}], cache_dir={cache!r}); ingest.touch(frame)"
+    ),
+}
+
+
+def touch(frame):
+    """Read every value once, so memory-mapped pages are actually faulted in."""
+    total = 0
+    for col in frame:
+        values = frame[col].cat.codes if isinstance(frame[col].dtype, pd.CategoricalDtype) else frame[col]
+        total += int(np.asarray(values).view(np.uint8).sum())
+    return total
+
+
+def measure(statement):
+    """(seconds, RSS growth in MB) of one statement in a fresh interpreter."""
+    code = _MEASURE.format(root=os.path.dirname(os.path.abspath(__file__)), statement=statement)
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    seconds, rss = out.stdout.split()
+    return float(seconds), float(rss)
+
+
+def report(paths, repeat=1):
+    """Time and RSS of each loading method per CSV; repeat > 1 measures an enlarged copy."""
+    workdir = tempfile.mkdtemp(prefix="ingest_report_")
+    results = {}
+    try:
+        for path in paths:
+            name = os.path.basename(path)
+            source = path
+            if repeat > 1:
+                source = os.path.join(workdir, name)
+                with open(path) as f:
+                    header = f.readline()
+                    body = f.read()
+                with open(source, "w") as f:
+                    f.write(header)
+                    for _ in range(repeat):
+                        f.write(body)
+            cache = os.path.join(workdir, "cache")
+            dates = [col for col, kind in SCHEMAS[name].items() if kind == "datetime"]
+            results[name] = {
+                method: measure(statement.format(path=source, dates=dates, name=name, cache=cache))
+                for method, statement in METHODS.items()
+            }
+            results[name]["size_mb"] = os.path.getsize(source) / 2**20
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Typed CSV ingestion with a memory-mapped column cache.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="parse the CSVs into the cache (skips files already cached)")
+    build.add_argument("--cache-dir", default=CACHE_DIR)
+    measure_parser = sub.add_parser("report", help="compare load time and RSS against pd.read_csv")
+    measure_parser.add_argument("--repeat", type=int, default=1, help="measure a copy with the rows repeated N times")
+    for command in (build, measure_parser):
+        command.add_argument("paths", nargs="*", default=list(SCHEMAS))
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        for path in args.paths:
+            frame = load_table(path, cache_dir=args.cache_dir)
+            print(f"{path}: {len(frame)} rows cached in {cache_path(path, args.cache_dir)}")
+        return
+
+    for name, result in report(args.paths, repeat=args.repeat).items():
+        print(f"{name} ({result.pop('size_mb'):.1f} MB)")
+        for method, (seconds, rss) in result.items():
+            print(f"  {method:30s} {seconds * 1000:9.1f} ms  {rss:8.1f} MB RSS")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+# instrumentation.py
+"""Per-stage latency histograms for the scoring hot path, plus a one-shot profiler.
+
+Instrumentation is off unless LOAN_METRICS=1 is set; timer() then returns a
+shared no-op context manager, so the instrumented code pays one function
+call per stage. When on, each stage's duration goes into a fixed-bucket
+histogram (a bisect and a few additions under a lock).
+
+Stages recorded by the app and the scoring service:
+
+    load_model, features, dataframe, pipeline.<step> (each fitted step of a
+    pipeline, e.g. pipeline.preprocessor, pipeline.var_thresh,
+    pipeline.classifier), predict (other backends), chart.gauge, chart.factors
+
+predict_proba() also counts the rows it scores (loan_scored_rows_total).
+
+render() formats everything in the Prometheus text exposition format. The
+app writes it to LOAN_METRICS_FILE (default loan_metrics.prom) after every
+run. The service serves it at GET /metrics/prometheus.
+
+LOAN_PROFILE=<path> traces the next scoring request in the process and
+writes its call stacks in collapsed ("folded") format. Each line is
+"frame;frame;frame <microseconds>", ready for flamegraph.pl or speedscope.
+
+Usage:
+    LOAN_METRICS=1 streamlit run loan_default_risk_visual_app.py
+    python instrumentation.py demo [--requests 200]        # prints the Prometheus text
+    python instrumentation.py profile [--output profile.folded]
+"""
+
+import argparse
+import bisect
+import collections
+import contextlib
+import os
+import sys
+import tempfile
+import threading
+import time
+
+ENABLED = os.environ.get("LOAN_METRICS", "").lower() in ("1", "true", "yes")
+METRICS_FILE = os.environ.get("LOAN_METRICS_FILE", "loan_metrics.prom")
+PROFILE_PATH = os.environ.get("LOAN_PROFILE") or None
+
+# Histogram bucket upper bounds in seconds (Prometheus "le" labels)
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Cumulative-at-render bucket counts plus sum and count, Prometheus style."""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+
+class Registry:
+    """Named stage histograms and counters; thread-safe."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms = collections.defaultdict(Histogram)
+        self.counters = collections.Counter()
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            self.histograms[stage].observe(seconds)
+
+    def increment(self, name, amount=1):
+        with self._lock:
+            self.counters[name] += amount
+
+    def render(self):
+        """Prometheus text exposition format."""
+        with self._lock:
+            histograms = {stage: (list(h.counts), h.sum, h.count) for stage, h in self.histograms.items()}
+            counters = dict(self.counters)
+        lines = [
+            "# HELP loan_stage_duration_seconds Time spent in each scoring stage.",
+            "# TYPE loan_stage_duration_seconds histogram",
+        ]
+        for stage in sorted(histograms):
+            counts, total, count = histograms[stage]
+            cumulative = 0
+            for bound, bucket_count in zip(BUCKETS + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'loan_stage_duration_seconds_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+            lines.append(f'loan_stage_duration_seconds_sum{{stage="{stage}"}} {total!r}')
+            lines.append(f'loan_stage_duration_seconds_count{{stage="{stage}"}} {count}')
+        for name in sorted(counters):
+            lines.append(f"# TYPE loan_{name}_total counter")
+            lines.append(f"loan_{name}_total {counters[name]}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+_NOOP = contextlib.nullcontext()
+
+
+class _Timer:
+    __slots__ = ("stage", "start")
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        REGISTRY.observe(self.stage, time.perf_counter() - self.start)
+        return False
+
+
+def timer(stage):
+    """Context manager timing one stage; a shared no-op when instrumentation is off."""
+    return _Timer(stage) if ENABLED else _NOOP
+
+
+def increment(name, amount=1):
+    if ENABLED:
+        REGISTRY.increment(name, amount)
+
+
+def render():
+    return REGISTRY.render()
+
+
+_dump_lock = threading.Lock()
+
+
+def dump(path=None):
+    """Write render() to path (default LOAN_METRICS_FILE) atomically.
+
+    Each call writes its own temporary file, so concurrent dumps (one per
+    Streamlit session, or several processes) never share one.
+    """
+    path = path or METRICS_FILE
+    with _dump_lock:
+        with tempfile.NamedTemporaryFile("w", dir=os.path.dirname(os.path.abspath(path)),
+                                         prefix=f".{os.path.basename(path)}-", suffix=".tmp", delete=False) as f:
+            f.write(render())
+        try:
+            os.replace(f.name, path)
+        except BaseException:
+            os.unlink(f.name)
+            raise
+
+
+# --- Pipeline steps ---
+def predict_proba(model, X):
+    """model.predict_proba(X), timing each fitted pipeline step when instrumentation is on.
+
+    Resamplers such as SMOTE only act during fit, so they are skipped here
+    exactly as the pipeline itself skips them at prediction time.
+    """
+    if not ENABLED:
+        return model.predict_proba(X)
+    increment("scored_rows", len(X))
+    steps = getattr(model, "steps", None)
+    if not steps:
+        with timer("predict"):
+            return model.predict_proba(X)
+    for name, step in steps[:-1]:
+        if step is None or step == "passthrough" or not hasattr(step, "transform"):
+            continue
+        with timer(f"pipeline.{name}"):
+            X = step.transform(X)
+    name, final = steps[-1]
+    with timer(f"pipeline.{name}"):
+        return final.predict_proba(X)
+
+
+# --- Profiling ---
+class _StackTracer:
+    """sys.setprofile hook that attributes self time to the full call stack."""
+
+    def __init__(self, root):
+        self.stack = [root]
+        self.totals = collections.Counter()
+        self.last = time.perf_counter_ns()
+
+    def __call__(self, frame, event, arg):
+        now = time.perf_counter_ns()
+        self.totals[";".join(self.stack)] += now - self.last
+        if event == "call":
+            code = frame.f_code
+            self.stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        elif event == "c_call":
+            self.stack.append(getattr(arg, "__qualname__", None) or getattr(arg, "__name__", "?"))
+        elif event in ("return", "c_return", "c_exception") and len(self.stack) > 1:
+            self.stack.pop()
+        self.last = time.perf_counter_ns()
+
+    def write(self, path):
+        with open(path, "w") as f:
+            for stack, nanoseconds in sorted(self.totals.items()):
+                if nanoseconds >= 1000:
+                    f.write(f"{stack} {nanoseconds // 1000}\n")
+
+
+@contextlib.contextmanager
+def profile(path, root="score"):
+    """Trace the calls made inside the block and write them to path in collapsed-stack format."""
+    tracer = _StackTracer(root)
+    sys.setprofile(tracer)
+    try:
+        yield
+    finally:
+        sys.setprofile(None)
+        tracer.write(path)
+
+
+_profile_lock = threading.Lock()
+_profile_done = False
+
+
+def profile_once(root="score"):
+    """profile(PROFILE_PATH) for the first call in the process; a no-op otherwise."""
+    global _profile_done
+    if PROFILE_PATH is None:
+        return _NOOP
+    with _profile_lock:
+        if _profile_done:
+            return _NOOP
+        _profile_done = True
+    return profile(PROFILE_PATH, root=root)
+
+
+# --- CLI ---
+def _score_once(model, applicant):
+    import pandas as pd
+
+    import scoring_core
+
+    with timer("features"):
+        features = scoring_core.engineer_features(applicant)
+    with timer("dataframe"):
+        frame = pd.DataFrame({col: [features[col]] for col in scoring_core.FEATURE_COLUMNS})
+    return predict_proba(model, frame)[0, 1]
+
+
+def main(argv=None):
+    global ENABLED
+
+    parser = argparse.ArgumentParser(description="Stage timings and profiling for the scoring path.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    demo = sub.add_parser("demo", help="score the default applicant repeatedly and print the Prometheus text")
+    demo.add_argument("--requests", type=int, default=200)
+    trace = sub.add_parser("profile", help="trace one scoring request to a collapsed-stack file")
+    trace.add_argument("--output", default="profile.folded")
+    for command in (demo, trace):
+        command.add_argument("--model", default="logistic_loan_default.pkl")
+    args = parser.parse_args(argv)
+
+    import model_backends
+    import scoring_core
+
+    ENABLED = True
+    with timer("load_model"):
+        model = model_backends.load_model(args.model)
+    applicant = dict(scoring_core.FIELD_DEFAULTS)
+
+    if args.command == "demo":
+        for _ in range(args.requests):
+            _score_once(model, applicant)
+        sys.stdout.write(render())
+    else:
+        _score_once(model, applicant)  # warm up imports and caches
+        with profile(args.output):
+            _score_once(model, applicant)
+        print(f"Collapsed stacks written to {args.output} (flamegraph.pl {args.output} > profile.svg)")
+
+
+if __name__ == "__main__":
+    main()
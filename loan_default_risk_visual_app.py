@@ -3,11 +3,26 @@
 import pandas as pd
 import numpy as np
 import streamlit as st
-import joblib
 import plotly.graph_objects as go
 import plotly.express as px
 from datetime import datetime
 import os
+import tempfile
+import time
+
+import audit_log
+import batch_scoring
+import customer_index
+import explain
+import feature_store
+import file_utils
+import instrumentation
+import model_backends
+import model_registry
+import monitoring
+import prediction_cache
+import scoring_core
+import sensitivity
 
 # Page settings
 st.set_page_config(page_title="Loan Default Risk Predictor", page_icon="💳", layout="wide")
@@ -91,21 +106,98 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# Load model with error handling
-@st.cache_resource
-def load_model():
+# Model file; LOAN_MODEL_PATH may point at any backend supported by model_backends.py
+MODEL_PATH = os.environ.get("LOAN_MODEL_PATH", "logistic_loan_default.pkl")
+# Once a version is promoted to production in this registry, it is served instead of MODEL_PATH
+REGISTRY_DIR = os.environ.get("LOAN_MODEL_REGISTRY", model_registry.REGISTRY_DIR)
+
+# Load model with error handling; the file fingerprint argument reloads it when the file changes
+@st.cache_resource(max_entries=1)
+def load_model(fingerprint):
     try:
-        if not os.path.exists("logistic_loan_default.pkl"):
-            st.error("⚠️ Model file 'logistic_loan_default.pkl' not found. Please ensure the model file is in the correct directory.")
-            st.info("📋 Expected file: logistic_loan_default.pkl")
+        if not os.path.exists(MODEL_PATH):
+            st.error(f"⚠️ Model file '{MODEL_PATH}' not found. Please ensure the model file is in the correct directory.")
+            st.info(f"📋 Expected file: {MODEL_PATH}")
             st.stop()
-        model = joblib.load("logistic_loan_default.pkl")
+        with instrumentation.timer("load_model"):
+            model = model_backends.load_model(MODEL_PATH)
         return model
     except Exception as e:
         st.error(f"❌ Error loading model: {str(e)}")
         st.stop()
 
-model = load_model()
+# Promoted registry version for a stage; swapped in the background when a new version is promoted
+@st.cache_resource
+def load_live_model(stage):
+    return model_registry.LiveModel(model_registry.ModelRegistry(REGISTRY_DIR), stage)
+
+# Scores each prediction with the registry's shadow version in a thread pool, off the request path
+@st.cache_resource
+def load_shadow_scorer():
+    return model_registry.ShadowScorer(load_live_model("shadow"))
+
+# Exact attributions for logistic models; None for boosted backends
+@st.cache_resource(max_entries=1)
+def load_explainer(fingerprint, _model):
+    return explain.explainer_for(_model)
+
+# Predictions shared across sessions; bound to the served model's SHA-256 every run, so a
+# changed model file or a registry promotion clears it (the file itself may not exist in registry mode)
+@st.cache_resource
+def load_prediction_cache():
+    return prediction_cache.PredictionCache(maxsize=10000, ttl_seconds=3600)
+
+# Drift of the scored applicants against the training reference; None until the reference is built
+@st.cache_resource
+def load_drift_monitor():
+    if not os.path.exists(monitoring.REFERENCE_PATH):
+        return None
+    return monitoring.DriftMonitor.from_file(monitoring.REFERENCE_PATH)
+
+# Every decision shown is queued to the append-only audit log; a background thread writes it
+@st.cache_resource
+def load_audit_log():
+    return audit_log.AuditLog(audit_log.DB_PATH)
+
+@st.cache_data(max_entries=1)
+def load_model_version(fingerprint):
+    return file_utils.file_sha256(MODEL_PATH)
+
+# Fitted calibration, threshold and bands from calibration.py; None keeps the linear 300-850 defaults
+@st.cache_resource(max_entries=1)
+def load_score_mapping(fingerprint):
+    return scoring_core.load_score_mapping(scoring_core.SCORE_MAPPING_PATH)
+
+# The mapping applied to the served model: None (linear scale) if it was fitted for another model
+@st.cache_resource(max_entries=4)
+def load_served_mapping(fingerprint, model_version):
+    return scoring_core.mapping_for_model(load_score_mapping(fingerprint), model_version)
+
+# One deployment per run, so a promotion never mixes two versions in one assessment
+deployment = load_live_model("production").current()
+if deployment is not None:
+    model = deployment.model
+    model_fingerprint = model_version = deployment.sha256
+else:
+    try:
+        model_fingerprint = prediction_cache.file_fingerprint(MODEL_PATH)
+    except OSError:
+        model_fingerprint = None
+    model = load_model(model_fingerprint)
+    model_version = load_model_version(model_fingerprint)
+explainer = load_explainer(model_fingerprint, model)
+predictions = load_prediction_cache()
+predictions.bind(model_version)
+shadow_scorer = load_shadow_scorer()
+drift_monitor = load_drift_monitor()
+decision_log = load_audit_log()
+try:
+    mapping_fingerprint = prediction_cache.file_fingerprint(scoring_core.SCORE_MAPPING_PATH)
+    fitted_mapping = load_score_mapping(mapping_fingerprint)
+    score_mapping = load_served_mapping(mapping_fingerprint, model_version)
+except OSError:
+    fitted_mapping = score_mapping = None
+good_threshold = scoring_core.good_threshold(score_mapping)
 
 # --- HEADER IMAGE ---
 st.image("https://images.unsplash.com/photo-1563013544-824ae1b704d3", use_container_width=True)
@@ -146,6 +238,67 @@ st.markdown("""
 
 st.markdown('<p style="color: #94a3b8; text-align: center; font-style: italic;">All fields are required for accurate risk assessment</p>', unsafe_allow_html=True)
 
+# --- CUSTOMER LOOKUP ---
+# Form values live in session state, so a lookup can pre-fill them
+for field, default in scoring_core.FIELD_DEFAULTS.items():
+    st.session_state.setdefault(field, default)
+
+# Opened on the first search; reopened (and rebuilt) when either loan history CSV changes
+@st.cache_resource(max_entries=1)
+def load_customer_index(fingerprints):
+    return customer_index.load_index()
+
+def prefill_from_customer():
+    customerid = st.session_state["customer_search"].strip()
+    if not customerid:
+        return
+    try:
+        fingerprints = tuple(prediction_cache.file_fingerprint(path)
+                             for path in (feature_store.PREVLOANS_PATH, feature_store.DEMOGRAPHICS_PATH))
+        record = load_customer_index(fingerprints).lookup(customerid)
+    except (OSError, ValueError) as e:
+        st.session_state["customer_lookup"] = ("error", f"Customer lookup unavailable: {e}")
+        return
+    if record is None:
+        st.session_state["customer_lookup"] = ("warning", f"No loan history or profile found for customer {customerid}.")
+        return
+    # Profile fields this customer has no record of go back to the defaults,
+    # so nothing from a previously looked-up customer is scored as theirs
+    profile_fields = ["age"] + customer_index.CATEGORICAL_FIELDS
+    for field in profile_fields:
+        st.session_state[field] = scoring_core.FIELD_DEFAULTS[field]
+    clipped = []
+    for field, value in record.items():
+        if field in scoring_core.FIELD_RANGES:
+            low, high = scoring_core.FIELD_RANGES[field]
+            if not low <= value <= high:
+                clipped.append(field)
+            value = type(low)(min(max(value, low), high))
+        st.session_state[field] = value
+    message = f"Filled {len(record)} fields from customer {customerid}'s history."
+    missing = [field for field in profile_fields if field not in record]
+    if missing:
+        message += f" No demographics record: {', '.join(missing)} reset to the defaults."
+    if clipped:
+        message += f" Clipped to the form's range: {', '.join(clipped)}."
+    st.session_state["customer_lookup"] = ("success", message)
+
+def reset_form():
+    for field, default in scoring_core.FIELD_DEFAULTS.items():
+        st.session_state[field] = default
+    st.session_state["customer_search"] = ""
+
+st.text_input(
+    "🔎 Returning customer ID",
+    key="customer_search",
+    on_change=prefill_from_customer,
+    placeholder="Enter a customerid and press Enter to fill the history and profile fields",
+)
+customer_lookup = st.session_state.pop("customer_lookup", None)
+if customer_lookup is not None:
+    lookup_kind, lookup_message = customer_lookup
+    getattr(st, lookup_kind)(lookup_message)
+
 # --- INPUT SECTIONS ---
 
 # Loan Details Section
@@ -159,13 +312,13 @@ col1, col2 = st.columns(2)
 
 with col1:
     st.markdown('<div class="input-container">', unsafe_allow_html=True)
-    loanamount = st.number_input("Loan Amount", min_value=100, max_value=1000000, value=50000)
-    termdays = st.number_input("Loan Term (days)", 10, 720, 90)
+    loanamount = st.number_input("Loan Amount", min_value=100, max_value=1000000, key="loanamount")
+    termdays = st.number_input("Loan Term (days)", 10, 720, key="termdays")
     st.markdown('</div>', unsafe_allow_html=True)
 
 with col2:
     st.markdown('<div class="input-container">', unsafe_allow_html=True)
-    repayment_curr_ratio = st.number_input("Repayment Current Ratio", 0.0, 2.0, 1.0)
+    repayment_curr_ratio = st.number_input("Repayment Current Ratio", 0.0, 2.0, key="repayment_curr_ratio")
     st.markdown('</div>', unsafe_allow_html=True)
 
 # Payment History Section
@@ -179,13 +332,13 @@ col3, col4 = st.columns(2)
 
 with col3:
     st.markdown('<div class="input-container">', unsafe_allow_html=True)
-    num_prev_loans = st.number_input("Number of Previous Loans", 0.00, 50.00, 3.00)
-    avg_repay_delay_days = st.number_input("Average Repay Delay (days)", -50.00, 365.00, 10.00)
+    num_prev_loans = st.number_input("Number of Previous Loans", 0.00, 50.00, key="num_prev_loans")
+    avg_repay_delay_days = st.number_input("Average Repay Delay (days)", -50.00, 365.00, key="avg_repay_delay_days")
     st.markdown('</div>', unsafe_allow_html=True)
 
 with col4:
     st.markdown('<div class="input-container">', unsafe_allow_html=True)
-    total_firstrepaid_late = st.number_input("Total First Repaid Late", 0.00, 50.00, 2.00)
+    total_firstrepaid_late = st.number_input("Total First Repaid Late", 0.00, 50.00, key="total_firstrepaid_late")
     st.markdown('</div>', unsafe_allow_html=True)
 
 # Financial History Section
@@ -199,14 +352,14 @@ col5, col6 = st.columns(2)
 
 with col5:
     st.markdown('<div class="input-container">', unsafe_allow_html=True)
-    avg_prev_repayment_ratio = st.number_input("Avg Previous Repayment Ratio", 0.0, 2.0, 1.0)
-    avg_duration_days = st.number_input("Avg Duration of Previous Loans (days)", 0.00, 720.00, 180.00)
+    avg_prev_repayment_ratio = st.number_input("Avg Previous Repayment Ratio", 0.0, 2.0, key="avg_prev_repayment_ratio")
+    avg_duration_days = st.number_input("Avg Duration of Previous Loans (days)", 0.00, 720.00, key="avg_duration_days")
     st.markdown('</div>', unsafe_allow_html=True)
 
 with col6:
     st.markdown('<div class="input-container">', unsafe_allow_html=True)
-    avg_prev_interest = st.number_input("Avg Previous Interest", 0.00, 100000.00, 5000.00)
-    age = st.number_input("Client Age", 18, 100, 30)
+    avg_prev_interest = st.number_input("Avg Previous Interest", 0.00, 100000.00, key="avg_prev_interest")
+    age = st.number_input("Client Age", 18, 100, key="age")
     st.markdown('</div>', unsafe_allow_html=True)
 
 # Banking & Employment Profile Section
@@ -220,49 +373,41 @@ col7, col8 = st.columns(2)
 
 with col7:
     st.markdown('<div class="input-container">', unsafe_allow_html=True)
-    bank_account_type = st.selectbox("Bank Account Type", ['Other', 'Savings', 'Current'])
+    bank_account_type = st.selectbox("Bank Account Type", ['Other', 'Savings', 'Current'], key="bank_account_type")
     st.markdown('</div>', unsafe_allow_html=True)
 
 with col8:
     st.markdown('<div class="input-container">', unsafe_allow_html=True)
     employment_status_clients = st.selectbox(
         "Employment Status",
-        ['Permanent', 'Unknown', 'Unemployed', 'Self-Employed', 'Student', 'Retired', 'Contract']
+        ['Permanent', 'Unknown', 'Unemployed', 'Self-Employed', 'Student', 'Retired', 'Contract'],
+        key="employment_status_clients"
     )
     st.markdown('</div>', unsafe_allow_html=True)
 
+applicant = {
+    "loanamount": loanamount,
+    "termdays": termdays,
+    "repayment_curr_ratio": repayment_curr_ratio,
+    "num_prev_loans": num_prev_loans,
+    "avg_repay_delay_days": avg_repay_delay_days,
+    "total_firstrepaid_late": total_firstrepaid_late,
+    "avg_prev_repayment_ratio": avg_prev_repayment_ratio,
+    "avg_duration_days": avg_duration_days,
+    "avg_prev_interest": avg_prev_interest,
+    "age": age,
+    "bank_account_type": bank_account_type,
+    "employment_status_clients": employment_status_clients,
+}
+
 # Input validation
 def validate_inputs():
-    errors = []
-    warnings = []
-    
-    if loanamount <= 0:
-        errors.append("Loan amount must be positive")
-    
-    if repayment_curr_ratio < 0.1:
-        warnings.append("Very low repayment ratio may indicate high risk")
-    elif repayment_curr_ratio < 0.5:
-        warnings.append("Low repayment ratio detected")
-    
-    if avg_repay_delay_days > 30:
-        warnings.append("High average payment delay may affect approval")
-    
-    if num_prev_loans > 0 and total_firstrepaid_late / num_prev_loans > 0.5:
-        warnings.append("High rate of late first payments detected")
-    
-    return errors, warnings
+    return scoring_core.validate_applicant(applicant)
 
 # --- Feature Engineering ---
 try:
-    repayment_efficiency = repayment_curr_ratio / (avg_prev_repayment_ratio + 1e-6)
-    late_payment_rate = total_firstrepaid_late / (num_prev_loans + 1e-6) if num_prev_loans > 0 else 0
-
-    sqrt_loanamount = np.sqrt(loanamount)
-    sqrt_termdays = np.sqrt(termdays)
-    sqrt_avg_prev_interest = np.sqrt(avg_prev_interest)
-    sqrt_repayment_efficiency = np.sqrt(abs(repayment_efficiency))
-    sqrt_late_payment_rate = np.sqrt(late_payment_rate)
-    
+    with instrumentation.timer("features"):
+        features = scoring_core.engineer_features(applicant)
 except Exception as e:
     st.error(f"Error in feature calculation: {str(e)}")
     st.stop()
@@ -275,8 +420,7 @@ with col_predict:
     predict_button = st.button("🚀 Predict Loan Risk", use_container_width=True, type="primary")
 
 with col_clear:
-    if st.button("🔄 Reset Form", use_container_width=True):
-        st.rerun()
+    st.button("🔄 Reset Form", use_container_width=True, on_click=reset_form)
 
 st.markdown('</div>', unsafe_allow_html=True)
 
@@ -294,60 +438,38 @@ if predict_button:
         
         try:
             # Prepare data
-            data = {
-                "loanamount": [loanamount],
-                "termdays": [termdays],
-                "repayment_curr_ratio": [repayment_curr_ratio],
-                "num_prev_loans": [num_prev_loans],
-                "avg_repay_delay_days": [avg_repay_delay_days],
-                "total_firstrepaid_late": [total_firstrepaid_late],
-                "avg_prev_repayment_ratio": [avg_prev_repayment_ratio],
-                "avg_duration_days": [avg_duration_days],
-                "avg_prev_interest": [avg_prev_interest],
-                "age": [age],
-                "bank_account_type": [bank_account_type],
-                "employment_status_clients": [employment_status_clients],
-                "repayment_efficiency": [repayment_efficiency],
-                "late_payment_rate": [late_payment_rate],
-                "sqrt_loanamount": [sqrt_loanamount],
-                "sqrt_termdays": [sqrt_termdays],
-                "sqrt_avg_prev_interest": [sqrt_avg_prev_interest],
-                "sqrt_repayment_efficiency": [sqrt_repayment_efficiency],
-                "sqrt_late_payment_rate": [sqrt_late_payment_rate]
-            }
-            df = pd.DataFrame(data)
-
-            # Predict
-            proba_good = model.predict_proba(df)[0, 1]
-            proba_bad = 1 - proba_good
+            def predict():
+                with instrumentation.profile_once():
+                    with instrumentation.timer("dataframe"):
+                        data = {col: [features[col]] for col in scoring_core.FEATURE_COLUMNS}
+                        df = pd.DataFrame(data)
+                    return instrumentation.predict_proba(model, df)[0, 1]
+
+            # Predict (repeat and what-if scores are served from the cache)
+            proba_good = predictions.get_or_compute(features, predict)
+            if deployment is not None:
+                shadow_scorer.submit(features, proba_good, primary_version=deployment.version, mapping=score_mapping)
+            # Both probability cards show the calibrated value, so they add up to 100%
+            calibrated_good = scoring_core.calibrated_proba(proba_good, score_mapping)
+            proba_bad = 1 - calibrated_good
             
             # Credit score calculation
-            min_score, max_score = 300, 850
-            credit_score = min_score + (max_score - min_score) * proba_good
-            good_threshold = 575
-            classification = "Good" if credit_score >= good_threshold else "Bad"
+            credit_score = scoring_core.credit_score(proba_good, score_mapping)
+            if drift_monitor is not None:
+                # Drift is tracked on the uncalibrated score the reference was built from
+                drift_monitor.update_one(applicant, scoring_core.credit_score(proba_good))
+            classification = scoring_core.classification(credit_score, score_mapping)
             
             # Risk level categorization
-            if credit_score >= 750:
-                risk_level = "Excellent"
-                risk_color = "#10b981"
-                risk_icon = "🟢"
-            elif credit_score >= 700:
-                risk_level = "Good"
-                risk_color = "#22c55e" 
-                risk_icon = "🟢"
-            elif credit_score >= 650:
-                risk_level = "Fair"
-                risk_color = "#f59e0b"
-                risk_icon = "🟡"
-            elif credit_score >= 575:
-                risk_level = "Poor"
-                risk_color = "#f97316"
-                risk_icon = "🟠"
-            else:
-                risk_level = "Very Poor"
-                risk_color = "#ef4444"
-                risk_icon = "🔴"
+            risk_level = scoring_core.risk_level(credit_score, score_mapping)
+            risk_color, risk_icon = scoring_core.risk_style(risk_level)
+
+            # Audit record, stamped with the same time the results show
+            assessed_at = datetime.now()
+            decision_log.record(
+                features, proba_good, credit_score, risk_level, scoring_core.decision(credit_score, score_mapping),
+                model_version=model_version, timestamp=assessed_at
+            )
 
             # --- RESULTS SECTION ---
             st.markdown("""
@@ -386,7 +508,7 @@ if predict_button:
             with col_summary4:
                 st.markdown(f"""
                 <div style="background: rgba(255,255,255,0.1); padding: 1.5rem; border-radius: 12px; text-align: center; border: 1px solid rgba(255,255,255,0.2);">
-                    <h3 style="color: #10b981; margin: 0; font-size: 2rem;">{proba_good:.1%}</h3>
+                    <h3 style="color: #10b981; margin: 0; font-size: 2rem;">{calibrated_good:.1%}</h3>
                     <p style="color: #94a3b8; margin: 0.5rem 0 0 0;">Repayment Probability</p>
                 </div>
                 """, unsafe_allow_html=True)
@@ -395,8 +517,9 @@ if predict_button:
             st.markdown('<div style="margin: 2rem 0;">', unsafe_allow_html=True)
             col1, col2 = st.columns(2)
 
-            with col1:
+            with col1, instrumentation.timer("chart.gauge"):
                 # Enhanced gauge chart
+                excellent_from, _, fair_from, poor_from = scoring_core.band_cutoffs(score_mapping)
                 gauge = go.Figure(go.Indicator(
                     mode="gauge+number",
                     value=credit_score,
@@ -410,15 +533,15 @@ if predict_button:
                         'borderwidth': 2,
                         'bordercolor': "rgba(255,255,255,0.3)",
                         'steps': [
-                            {'range': [300, 575], 'color': 'rgba(239, 68, 68, 0.3)'},
-                            {'range': [575, 650], 'color': 'rgba(245, 158, 11, 0.3)'},
-                            {'range': [650, 750], 'color': 'rgba(34, 197, 94, 0.3)'},
-                            {'range': [750, 850], 'color': 'rgba(16, 185, 129, 0.5)'}
+                            {'range': [300, poor_from], 'color': 'rgba(239, 68, 68, 0.3)'},
+                            {'range': [poor_from, fair_from], 'color': 'rgba(245, 158, 11, 0.3)'},
+                            {'range': [fair_from, excellent_from], 'color': 'rgba(34, 197, 94, 0.3)'},
+                            {'range': [excellent_from, 850], 'color': 'rgba(16, 185, 129, 0.5)'}
                         ],
                         'threshold': {
                             'line': {'color': "#ef4444", 'width': 4},
                             'thickness': 0.8,
-                            'value': 575
+                            'value': good_threshold
                         }
                     }
                 ))
@@ -432,30 +555,37 @@ if predict_button:
                 )
                 st.plotly_chart(gauge, use_container_width=True)
 
-            with col2:
-                # Risk factors contribution
-                risk_factors = {
-                    'Payment History': min(max(20 + avg_repay_delay_days * 2 + total_firstrepaid_late * 5, 5), 45),
-                    'Repayment Capacity': min(max((2 - repayment_curr_ratio) * 15, 5), 35),
-                    'Loan Characteristics': min(max(loanamount / 10000 + termdays / 50, 5), 25),
-                    'Employment Status': 15 if employment_status_clients == 'Permanent' else 25,
-                    'Previous Performance': min(max(late_payment_rate * 30, 5), 30)
-                }
-                
+            with col2, instrumentation.timer("chart.factors"):
+                # Risk factors contribution: exact model attributions when the model is logistic
                 factor_chart = go.Figure()
-                factor_chart.add_trace(go.Bar(
-                    y=list(risk_factors.keys()),
-                    x=list(risk_factors.values()),
-                    orientation='h',
-                    marker_color=[risk_color if v > 25 else '#f59e0b' if v > 15 else '#10b981' for v in risk_factors.values()],
-                    text=[f"{v:.1f}%" for v in risk_factors.values()],
-                    textposition='inside',
-                    textfont={'color': '#ffffff', 'size': 12}
-                ))
+                if explainer is not None:
+                    contributions = explainer.explain_one(features)[::-1]
+                    factor_chart.add_trace(go.Bar(
+                        y=[label for label, _ in contributions],
+                        x=[value for _, value in contributions],
+                        orientation='h',
+                        marker_color=['#10b981' if v > 0 else '#ef4444' for _, v in contributions],
+                        text=[f"{v:+.2f}" for _, v in contributions],
+                        textposition='inside',
+                        textfont={'color': '#ffffff', 'size': 12}
+                    ))
+                    factor_axis_title = "Contribution to log-odds of repayment (+ lowers risk)"
+                else:
+                    risk_factors = scoring_core.risk_factors(features)
+                    factor_chart.add_trace(go.Bar(
+                        y=list(risk_factors.keys()),
+                        x=list(risk_factors.values()),
+                        orientation='h',
+                        marker_color=[risk_color if v > 25 else '#f59e0b' if v > 15 else '#10b981' for v in risk_factors.values()],
+                        text=[f"{v:.1f}%" for v in risk_factors.values()],
+                        textposition='inside',
+                        textfont={'color': '#ffffff', 'size': 12}
+                    ))
+                    factor_axis_title = "Risk Impact (%)"
                 
                 factor_chart.update_layout(
                     title={'text': "Risk Factor Analysis", 'font': {'size': 24, 'color': '#ffffff'}},
-                    xaxis_title="Risk Impact (%)",
+                    xaxis_title=factor_axis_title,
                     yaxis_title="",
                     height=500,
                     margin=dict(l=20, r=20, t=100, b=50),
@@ -504,7 +634,7 @@ if predict_button:
             # Timestamp
             st.markdown(f"""
             <div style="text-align: center; color: #64748b; margin-top: 2rem; font-size: 0.9rem;">
-                Assessment completed on {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+                Assessment completed on {assessed_at.strftime(audit_log.TIMESTAMP_FORMAT)}
             </div>
             """, unsafe_allow_html=True)
 
@@ -512,6 +642,221 @@ if predict_button:
             st.error(f"❌ Prediction error: {str(e)}")
             st.info("Please check your inputs and try again. If the problem persists, contact support.")
 
+# --- SENSITIVITY SWEEP ---
+# Scores a 200x200 amount x term grid in one batch, so exploring loan sizes needs no repeated predicts
+if st.toggle("📐 Show approval boundary over loan amount and term"):
+    sweep_errors, _ = validate_inputs()
+    if sweep_errors:
+        st.info("Fix the input errors above to run the sensitivity sweep.")
+    else:
+        amounts, terms = sensitivity.default_axes()
+        grid_scores = sensitivity.score_grid(model, applicant, amounts, terms, mapping=score_mapping)
+        max_amounts = sensitivity.max_approvable_amounts(model, applicant, terms, mapping=score_mapping)
+        current_max = sensitivity.max_approvable_amounts(model, applicant, [termdays], mapping=score_mapping)[0]
+
+        boundary_chart = go.Figure()
+        boundary_chart.add_trace(go.Heatmap(
+            x=amounts, y=terms, z=grid_scores,
+            zmin=scoring_core.MIN_SCORE, zmax=scoring_core.MAX_SCORE,
+            colorscale=[[0, '#ef4444'], [0.5, '#f59e0b'], [1, '#10b981']],
+            colorbar={'title': 'Score'},
+            hovertemplate="Amount %{x:,.0f}<br>Term %{y:.0f} days<br>Score %{z:.0f}<extra></extra>"
+        ))
+        boundary_chart.add_trace(go.Scatter(
+            x=max_amounts, y=terms, mode='lines', name='Max approvable amount',
+            line={'color': '#ffffff', 'width': 3}
+        ))
+        boundary_chart.add_trace(go.Scatter(
+            x=[loanamount], y=[termdays], mode='markers', name='This applicant',
+            marker={'color': '#3b82f6', 'size': 14, 'symbol': 'x'}
+        ))
+        boundary_chart.update_layout(
+            title={'text': f"Approval Boundary (score ≥ {good_threshold:.0f})", 'font': {'size': 24, 'color': '#ffffff'}},
+            xaxis_title="Loan Amount",
+            yaxis_title="Loan Term (days)",
+            height=550,
+            margin=dict(l=20, r=20, t=100, b=50),
+            paper_bgcolor='rgba(0,0,0,0)',
+            plot_bgcolor='rgba(0,0,0,0)',
+            xaxis={'color': '#94a3b8'},
+            yaxis={'color': '#94a3b8'},
+            legend={'orientation': 'h', 'y': -0.15},
+            font={'color': '#ffffff'}
+        )
+        st.plotly_chart(boundary_chart, use_container_width=True)
+
+        if np.isnan(current_max):
+            st.warning(f"No loan amount is approvable at {termdays} days with this profile.")
+        else:
+            st.success(f"Largest approvable amount at {termdays} days: {current_max:,.0f}")
+
+# --- BULK SCORING ---
+# 10-point credit score bins for the running distribution
+SCORE_BINS = np.arange(scoring_core.MIN_SCORE, scoring_core.MAX_SCORE + 10, 10)
+# Streamlit holds a download in server memory while it is served, so larger results stay on disk
+DOWNLOAD_LIMIT_MB = float(os.environ.get("LOAN_DOWNLOAD_LIMIT_MB", "50"))
+
+def score_distribution_chart(counts):
+    chart = go.Figure(go.Bar(
+        x=SCORE_BINS[:-1] + 5, y=counts, width=9,
+        marker_color=['#10b981' if b >= good_threshold else '#ef4444' for b in SCORE_BINS[:-1]]
+    ))
+    chart.update_layout(
+        title={'text': "Score Distribution", 'font': {'size': 20, 'color': '#ffffff'}},
+        xaxis_title="Credit Score",
+        yaxis_title="Applicants",
+        height=350,
+        margin=dict(l=20, r=20, t=60, b=40),
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        xaxis={'color': '#94a3b8'},
+        yaxis={'color': '#94a3b8', 'gridcolor': 'rgba(255,255,255,0.1)'},
+        font={'color': '#ffffff'}
+    )
+    return chart
+
+def score_upload(uploaded, chunksize):
+    """Stream an uploaded CSV through the model into a temp file; only summary counts are kept."""
+    previous = st.session_state.pop("bulk_result", None)
+    if previous is not None and os.path.exists(previous["path"]):
+        os.remove(previous["path"])
+    handle, path = tempfile.mkstemp(prefix="scored_", suffix=".csv")
+    os.close(handle)
+
+    progress = st.progress(0.0, text="Scoring ...")
+    distribution = st.empty()
+    counts = np.zeros(len(SCORE_BINS) - 1, dtype=np.int64)
+    decisions = {}
+    rows = 0
+    start = time.perf_counter()
+    # Every bulk decision shown or downloaded is audited, stamped like the single-applicant path
+    assessed_at = datetime.now()
+    uploaded.seek(0)
+    try:
+        for i, scored in enumerate(batch_scoring.iter_scored_chunks(model, uploaded, chunksize=chunksize, mapping=score_mapping)):
+            scored.to_csv(path, mode="w" if i == 0 else "a", header=(i == 0), index=False)
+            rows += len(scored)
+            counts += np.histogram(scored["credit_score"].dropna(), bins=SCORE_BINS)[0]
+            complete = scored[scored["proba_good"].notna()]
+            if drift_monitor is not None:
+                drift_monitor.update(complete, scoring_core.credit_score(complete["proba_good"].to_numpy()))
+            decision_log.record_many(
+                batch_scoring.feature_frame(complete[scoring_core.INPUT_COLUMNS]).to_dict("records"),
+                complete["proba_good"], complete["credit_score"], complete["risk_level"], complete["decision"],
+                model_version=model_version, source="bulk", timestamp=assessed_at
+            )
+            for label, count in scored["decision"].value_counts().items():
+                decisions[label] = decisions.get(label, 0) + int(count)
+            progress.progress(min(uploaded.tell() / max(uploaded.size, 1), 1.0), text=f"{rows:,} rows scored")
+            distribution.plotly_chart(score_distribution_chart(counts), use_container_width=True, key=f"bulk_distribution_{i}")
+    except Exception:
+        os.remove(path)
+        raise
+    progress.progress(1.0, text=f"{rows:,} rows scored")
+    distribution.empty()
+    return {
+        "file_id": uploaded.file_id,
+        "name": uploaded.name,
+        "path": path,
+        "rows": rows,
+        "seconds": time.perf_counter() - start,
+        "counts": counts,
+        "decisions": decisions,
+    }
+
+# A fragment, so uploading and scoring rerun only this section, not the whole form
+@st.fragment
+def bulk_scoring():
+    st.markdown("## 📂 Bulk CSV Scoring")
+    st.caption("Upload applicants with the form fields as columns, or already-engineered model inputs. "
+               "The file is scored chunk by chunk into a file on the server; only summary counts are kept in the session.")
+    uploaded = st.file_uploader("Applicants CSV", type="csv")
+    if uploaded is None:
+        return
+    chunksize = st.select_slider("Rows per chunk", options=[10000, 50000, 100000, 250000], value=50000)
+
+    result = st.session_state.get("bulk_result")
+    if st.button("📊 Score file", type="primary"):
+        try:
+            result = score_upload(uploaded, chunksize)
+        except ValueError as e:
+            st.error(f"❌ {e}")
+            return
+        st.session_state["bulk_result"] = result
+    if result is None or result["file_id"] != uploaded.file_id or not os.path.exists(result["path"]):
+        return
+
+    rate = result["rows"] / result["seconds"] if result["seconds"] > 0 else float("inf")
+    col_rows, col_approve, col_decline, col_missing = st.columns(4)
+    col_rows.metric("Rows scored", f"{result['rows']:,}", f"{rate:,.0f} rows/sec", delta_color="off")
+    col_approve.metric("Approve", f"{result['decisions'].get('Approve', 0):,}")
+    col_decline.metric("Decline", f"{result['decisions'].get('Decline', 0):,}")
+    col_missing.metric("Insufficient data", f"{result['decisions'].get('Insufficient data', 0):,}")
+    st.plotly_chart(score_distribution_chart(result["counts"]), use_container_width=True, key="bulk_distribution")
+
+    size_mb = os.path.getsize(result["path"]) / 2**20
+    if size_mb > DOWNLOAD_LIMIT_MB:
+        st.info(f"The scored file is {size_mb:,.0f} MB, over the {DOWNLOAD_LIMIT_MB:,.0f} MB download limit "
+                "(LOAN_DOWNLOAD_LIMIT_MB): a browser download would hold all of it in server memory. "
+                f"It is kept on the server at `{result['path']}`; for files this size, score with "
+                "`python batch_scoring.py input.csv output.csv` instead.")
+        return
+
+    st.download_button(
+        "⬇️ Download scored CSV",
+        # Opened only when the button is clicked; the handle is released once Streamlit has read it
+        data=lambda: open(result["path"], "rb"),
+        file_name=f"scored_{result['name']}",
+        mime="text/csv",
+        on_click="ignore",
+    )
+
+bulk_scoring()
+
+# Prediction cache counters
+cache_stats = predictions.stats()
+st.sidebar.markdown("---")
+st.sidebar.caption(
+    f"⚡ Prediction cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses "
+    f"({cache_stats['hit_rate']:.0%}), {cache_stats['entries']} entries"
+)
+
+# Served model
+if deployment is not None:
+    st.sidebar.caption(f"🗂️ Model: registry v{deployment.version} ({os.path.basename(deployment.path)})")
+    shadow_stats = shadow_scorer.stats()
+    if shadow_stats["shadow_version"] is not None:
+        st.sidebar.caption(
+            f"👥 Shadow v{shadow_stats['shadow_version']}: {shadow_stats['rows']} scored, "
+            f"mean |Δscore| {shadow_stats['mean_abs_score_diff']:.1f}, {shadow_stats['decision_flips']} decision flips"
+        )
+
+# Score mapping in use
+if fitted_mapping is None:
+    st.sidebar.caption("🎯 Score mapping: linear defaults (run `python calibration.py fit`)")
+elif score_mapping is not None:
+    st.sidebar.caption(f"🎯 Score mapping v{score_mapping.version}: approve from {good_threshold:.0f}")
+else:
+    st.sidebar.warning(f"🎯 Score mapping v{fitted_mapping.version} was fitted for a different model file, "
+                       "so the linear 300-850 scale is used; refit it with `python calibration.py fit`")
+
+# Drift status
+if drift_monitor is None:
+    st.sidebar.caption("📉 Drift monitoring off: run `python monitoring.py build-reference`")
+else:
+    drift_report = drift_monitor.report()
+    drift_alerts = drift_monitor.alerts(drift_report)
+    if drift_report["rows"] < drift_monitor.min_rows:
+        st.sidebar.caption(f"📉 Drift: {drift_report['rows']} of {drift_monitor.min_rows} rows needed")
+    elif drift_alerts:
+        st.sidebar.warning("📉 Drift detected\n\n" + "\n\n".join(drift_alerts))
+    else:
+        st.sidebar.caption(f"📉 Drift: stable over {drift_report['rows']:,} scored applicants")
+
+# Stage timings for scraping (LOAN_METRICS=1)
+if instrumentation.ENABLED:
+    instrumentation.dump()
+
 # Footer
 st.markdown("""
 <div style='text-align: center; color: #64748b; margin-top: 3rem; padding: 2rem; background: rgba(255,255,255,0.02); border-radius: 12px; border: 1px solid rgba(255,255,255,0.1);'>
@@ -0,0 +1,307 @@
+# model_backends.py
+"""Pluggable model backends: the logistic pipeline, XGBoost or CatBoost.
+
+Every backend exposes predict_proba(frame) -> [[p_bad, p_good], ...] over a
+frame of scoring_core.FEATURE_COLUMNS, which is the interface the app, batch
+scoring and the scoring service already call. load_model() picks the backend
+from the file extension:
+
+    .pkl          pickled imblearn/sklearn pipeline (joblib)
+    .json         NumPy-only logistic artifact (fast_scorer.py)
+    .ubj          XGBoost booster
+    .cbm          CatBoost model
+
+The boosted engines are trained on the same engineered features as the
+logistic model. xgboost and catboost are imported only when used.
+
+Usage:
+    python model_backends.py train --engine xgboost [--threads 4]
+    python model_backends.py compare [--threads 4] [--rows 100000]
+"""
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+import scoring_core
+
+XGBOOST_PATH = "xgboost_loan_default.ubj"
+CATBOOST_PATH = "catboost_loan_default.cbm"
+
+# Numeric inputs the trees see; the same set the logistic model scales
+TREE_NUMERIC_COLUMNS = [
+    "repayment_curr_ratio",
+    "num_prev_loans",
+    "avg_repay_delay_days",
+    "total_firstrepaid_late",
+    "avg_prev_repayment_ratio",
+    "avg_duration_days",
+    "age",
+    "sqrt_late_payment_rate",
+    "sqrt_termdays",
+    "sqrt_loanamount",
+    "sqrt_avg_prev_interest",
+    "sqrt_repayment_efficiency",
+]
+TREE_CATEGORICAL_COLUMNS = ["bank_account_type", "employment_status_clients"]
+
+
+def one_hot_matrix(columns):
+    """Dense float32 matrix of TREE_NUMERIC_COLUMNS plus one-hot form categories.
+
+    Unknown categories encode as all zeros, like the logistic pipeline's encoder.
+    """
+    blocks = [np.asarray(columns[col], dtype=np.float32) for col in TREE_NUMERIC_COLUMNS]
+    for col in TREE_CATEGORICAL_COLUMNS:
+        values = np.asarray(columns[col]).astype(str)
+        blocks.extend((values == choice).astype(np.float32) for choice in scoring_core.FIELD_CHOICES[col])
+    return np.column_stack(blocks)
+
+
+def one_hot_feature_names():
+    names = list(TREE_NUMERIC_COLUMNS)
+    for col in TREE_CATEGORICAL_COLUMNS:
+        names.extend(f"{col}={choice}" for choice in scoring_core.FIELD_CHOICES[col])
+    return names
+
+
+def _two_columns(proba_good):
+    proba_good = np.asarray(proba_good, dtype=float)
+    return np.column_stack([1.0 - proba_good, proba_good])
+
+
+# --- Backends ---
+class XGBoostBackend:
+    """XGBoost booster scored through a native DMatrix built from NumPy."""
+
+    def __init__(self, booster, threads=None):
+        self.booster = booster
+        if threads:
+            self.booster.set_param({"nthread": threads})
+
+    @classmethod
+    def load(cls, path=XGBOOST_PATH, threads=None):
+        import xgboost
+
+        booster = xgboost.Booster()
+        booster.load_model(path)
+        return cls(booster, threads=threads)
+
+    def save(self, path=XGBOOST_PATH):
+        self.booster.save_model(path)
+
+    def predict_proba(self, columns):
+        import xgboost
+
+        matrix = xgboost.DMatrix(one_hot_matrix(columns), feature_names=one_hot_feature_names())
+        return _two_columns(self.booster.predict(matrix))
+
+
+class CatBoostBackend:
+    """CatBoost model scored through a native Pool with categorical columns."""
+
+    def __init__(self, model, threads=None):
+        self.model = model
+        self.threads = threads or -1
+
+    @classmethod
+    def load(cls, path=CATBOOST_PATH, threads=None):
+        import catboost
+
+        model = catboost.CatBoostClassifier()
+        model.load_model(path)
+        return cls(model, threads=threads)
+
+    def save(self, path=CATBOOST_PATH):
+        self.model.save_model(path)
+
+    @staticmethod
+    def pool(columns, label=None):
+        import catboost
+        import pandas as pd
+
+        data = pd.DataFrame({col: np.asarray(columns[col], dtype=float) for col in TREE_NUMERIC_COLUMNS})
+        for col in TREE_CATEGORICAL_COLUMNS:
+            data[col] = np.asarray(columns[col]).astype(str)
+        return catboost.Pool(data, label=label, cat_features=TREE_CATEGORICAL_COLUMNS)
+
+    def predict_proba(self, columns):
+        proba_good = self.model.predict(self.pool(columns), prediction_type="Probability",
+                                        thread_count=self.threads)[:, 1]
+        return _two_columns(proba_good)
+
+
+def load_model(path, threads=None):
+    """Load any supported model file; see the module docstring for extensions."""
+    if path.endswith(".ubj"):
+        return XGBoostBackend.load(path, threads=threads)
+    if path.endswith(".cbm"):
+        return CatBoostBackend.load(path, threads=threads)
+    import fast_scorer
+
+    return fast_scorer.load_model(path)
+
+
+# --- Training ---
+def train_xgboost(X, y, threads=None, seed=42):
+    """Histogram-based CPU training with an explicit thread count."""
+    import xgboost
+
+    params = {
+        "objective": "binary:logistic",
+        "eval_metric": "auc",
+        "tree_method": "hist",
+        "max_bin": 256,
+        "max_depth": 4,
+        "eta": 0.05,
+        "subsample": 0.8,
+        "colsample_bytree": 0.8,
+        "min_child_weight": 5,
+        "nthread": threads or os.cpu_count(),
+        "seed": seed,
+    }
+    train = xgboost.DMatrix(one_hot_matrix(X), label=y, feature_names=one_hot_feature_names())
+    booster = xgboost.train(params, train, num_boost_round=300)
+    return XGBoostBackend(booster)
+
+
+def train_catboost(X, y, threads=None, seed=42):
+    """CPU training on quantized (histogram) feature borders with an explicit thread count."""
+    import catboost
+
+    model = catboost.CatBoostClassifier(
+        iterations=500,
+        depth=4,
+        learning_rate=0.05,
+        border_count=254,
+        loss_function="Logloss",
+        thread_count=threads or -1,
+        random_seed=seed,
+        verbose=False,
+        allow_writing_files=False,
+    )
+    model.fit(CatBoostBackend.pool(X, label=y))
+    return CatBoostBackend(model, threads=threads)
+
+
+TRAINERS = {"xgboost": train_xgboost, "catboost": train_catboost}
+DEFAULT_PATHS = {"xgboost": XGBOOST_PATH, "catboost": CATBOOST_PATH}
+
+
+def training_split(seed=42, test_size=0.2):
+    """The same stratified train/holdout split train_model.py reports on."""
+    from sklearn.model_selection import train_test_split
+
+    import train_model
+
+    X, y = train_model.load_training_data()
+    return train_test_split(X, y, test_size=test_size, stratify=y, random_state=seed)
+
+
+# --- Comparison ---
+def latency_us(model, row, repeats=200):
+    timings = np.empty(repeats)
+    for i in range(repeats):
+        start = time.perf_counter()
+        model.predict_proba(row)
+        timings[i] = time.perf_counter() - start
+    return float(np.median(timings) * 1e6)
+
+
+def throughput(model, frame, min_seconds=0.5):
+    runs = 0
+    start = time.perf_counter()
+    while True:
+        model.predict_proba(frame)
+        runs += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            return runs * len(frame) / elapsed
+
+
+def compare_engines(threads=None, rows=100000, engines=("xgboost", "catboost")):
+    """Train every engine on the same split and compare AUC, per-row latency and batch throughput."""
+    from sklearn.metrics import roc_auc_score
+
+    import fast_scorer
+    import train_model
+
+    X_train, X_test, y_train, y_test = training_split()
+
+    candidates = {}
+    # The shipped logistic configuration, refit on the same training split for a fair AUC
+    logistic = train_model.build_pipeline().fit(X_train, y_train)
+    candidates["logistic (pipeline)"] = logistic
+    candidates["logistic (fast_scorer)"] = fast_scorer.FastScorer.from_pipeline(logistic)
+    train_seconds = {}
+    for engine in engines:
+        start = time.perf_counter()
+        candidates[engine] = TRAINERS[engine](X_train, y_train, threads=threads)
+        train_seconds[engine] = time.perf_counter() - start
+
+    rng = np.random.default_rng(0)
+    batch = X_test.iloc[rng.integers(0, len(X_test), rows)].reset_index(drop=True)
+    row = X_test.iloc[[0]]
+
+    report = {}
+    for name, model in candidates.items():
+        report[name] = {
+            "holdout_roc_auc": float(roc_auc_score(y_test, model.predict_proba(X_test)[:, 1])),
+            "single_row_us": latency_us(model, row),
+            "throughput_rows_per_sec": throughput(model, batch),
+            "train_seconds": train_seconds.get(name),
+        }
+    return report
+
+
+def print_report(report):
+    print(f"{'engine':24s} {'AUC':>7s} {'1-row us':>10s} {'rows/sec':>12s} {'train s':>8s}")
+    for name, result in report.items():
+        train_s = f"{result['train_seconds']:8.1f}" if result["train_seconds"] is not None else f"{'-':>8s}"
+        print(f"{name:24s} {result['holdout_roc_auc']:7.4f} {result['single_row_us']:10.1f} "
+              f"{result['throughput_rows_per_sec']:12,.0f} {train_s}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train and compare boosted-tree model backends.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    train = sub.add_parser("train", help="train a boosted engine on the engineered features")
+    train.add_argument("--engine", choices=sorted(TRAINERS), default="xgboost")
+    train.add_argument("--output", help="model file (default: engine-specific)")
+
+    compare = sub.add_parser("compare", help="side-by-side AUC, latency and throughput against the logistic model")
+    compare.add_argument("--rows", type=int, default=100000, help="batch size for the throughput measurement")
+    compare.add_argument("--report", default="engine_comparison.json")
+
+    for command in (train, compare):
+        command.add_argument("--threads", type=int, help="CPU threads for training and inference (default: all)")
+    args = parser.parse_args(argv)
+
+    if args.command == "train":
+        from sklearn.metrics import roc_auc_score
+
+        import train_model
+
+        X_train, X_test, y_train, y_test = training_split()
+        model = TRAINERS[args.engine](X_train, y_train, threads=args.threads)
+        auc = roc_auc_score(y_test, model.predict_proba(X_test)[:, 1])
+        # Refit on every row for the served model, like the logistic pickle
+        X, y = train_model.load_training_data()
+        model = TRAINERS[args.engine](X, y, threads=args.threads)
+        output = args.output or DEFAULT_PATHS[args.engine]
+        model.save(output)
+        print(f"{args.engine}: holdout ROC AUC {auc:.4f}; refit on all rows -> {output}")
+    else:
+        report = compare_engines(threads=args.threads, rows=args.rows)
+        print_report(report)
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.report}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,429 @@
+# model_registry.py
+"""Local model registry with atomic promotion, hot reload and shadow scoring.
+
+Layout under model_registry/:
+
+    v0001/<model file>      the registered artifact, never modified again
+    v0001/metadata.json     version, file, sha256, size, created, description, source
+    stages.json             which version serves each stage ("production", "shadow")
+
+register() copies a model file into the next free version directory. The
+directory is built under a temporary name and renamed into place, so a
+version is either complete or absent. promote() holds an exclusive lock on
+stages.json.lock while it reads, changes and rewrites stages.json, so two
+concurrent promotions cannot lose each other's update. The new content goes
+to a temporary file that is os.replace()d into place, so readers see the
+old or the new assignment, never a partial one.
+
+LiveModel serves one stage. Every check_interval seconds it stats
+stages.json; when a promotion changed the stage's version, the new artifact
+is loaded, its SHA-256 checked against the metadata, and swapped in by
+replacing a single Deployment tuple. Requests take one Deployment and use
+it throughout, so a request never mixes two versions. While the new version
+loads in a background thread, the old one keeps serving.
+
+ShadowScorer scores the same requests with a candidate model (the "shadow"
+stage) in a small thread pool. The primary response does not wait for it:
+submit() only queues the rows, and drops them (counted) when the pool is
+backed up. Each shadow result is appended to shadow_log.csv with the
+primary and shadow probabilities, the difference in uncalibrated credit
+score, and both decisions. Decisions go through the ScoreMapping the primary
+was served with (passed to submit() per request), so a decision flip is a
+change in what would be served.
+
+Usage:
+    python model_registry.py register logistic_loan_default.pkl [--description "..."] [--promote]
+    python model_registry.py list
+    python model_registry.py promote 2 [--stage shadow]
+    python model_registry.py clear --stage shadow
+    python model_registry.py verify
+"""
+
+import argparse
+import collections
+import concurrent.futures
+import contextlib
+import csv
+import datetime
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+import audit_log
+import file_utils
+import model_backends
+import prediction_cache
+import scoring_core
+
+REGISTRY_DIR = "model_registry"
+STAGES_FILE = "stages.json"
+LOCK_FILE = "stages.json.lock"
+METADATA_FILE = "metadata.json"
+STAGES = ("production", "shadow")
+SHADOW_LOG_PATH = "shadow_log.csv"
+SHADOW_LOG_COLUMNS = [
+    "timestamp", "source", "primary_version", "shadow_version", "proba_primary", "proba_shadow",
+    "score_diff", "decision_primary", "decision_shadow",
+]
+
+# One served version: the model plus what identifies it
+Deployment = collections.namedtuple("Deployment", ["version", "sha256", "path", "model"])
+
+
+@contextlib.contextmanager
+def _locked(path):
+    """Hold an exclusive lock on path (created if missing) across processes."""
+    with open(path, "a+b") as f:
+        if os.name == "nt":
+            import msvcrt
+
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:  # LK_LOCK gives up after ten seconds; keep waiting
+                    pass
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+# --- Registry ---
+class ModelRegistry:
+    """Versioned model artifacts and their stage assignments in one directory."""
+
+    def __init__(self, root=REGISTRY_DIR):
+        self.root = root
+        self.stages_path = os.path.join(root, STAGES_FILE)
+        self.lock_path = os.path.join(root, LOCK_FILE)
+
+    def version_dir(self, version):
+        return os.path.join(self.root, f"v{version:04d}")
+
+    def versions(self):
+        """Metadata of every registered version, oldest first."""
+        if not os.path.isdir(self.root):
+            return []
+        names = sorted(name for name in os.listdir(self.root) if name.startswith("v") and name[1:].isdigit())
+        return [self.get(int(name[1:])) for name in names]
+
+    def get(self, version):
+        path = os.path.join(self.version_dir(version), METADATA_FILE)
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise ValueError(f"model version {version} is not registered") from None
+
+    def artifact_path(self, version):
+        return os.path.join(self.version_dir(version), self.get(version)["file"])
+
+    def register(self, path, description="", metadata=None):
+        """Copy a model file in as the next version; returns the new version number."""
+        os.makedirs(self.root, exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(prefix=".tmp-", dir=self.root)
+        try:
+            file_name = os.path.basename(path)
+            shutil.copyfile(path, os.path.join(tmp_dir, file_name))
+            entry = {
+                "file": file_name,
+                "sha256": file_utils.file_sha256(os.path.join(tmp_dir, file_name)),
+                "size": os.path.getsize(path),
+                "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "description": description,
+                "source": os.path.abspath(path),
+                **(metadata or {}),
+            }
+            versions = self.versions()
+            version = versions[-1]["version"] + 1 if versions else 1
+            while True:
+                entry["version"] = version
+                with open(os.path.join(tmp_dir, METADATA_FILE), "w") as f:
+                    json.dump(entry, f, indent=2)
+                try:
+                    # Fails if another process took this number first; then try the next one
+                    os.rename(tmp_dir, self.version_dir(version))
+                    return version
+                except OSError:
+                    if not os.path.exists(self.version_dir(version)):
+                        raise
+                    version += 1
+        except BaseException:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+    def load(self, version):
+        """Load a version's model after checking the artifact against its recorded SHA-256."""
+        entry = self.get(version)
+        path = os.path.join(self.version_dir(version), entry["file"])
+        if file_utils.file_sha256(path) != entry["sha256"]:
+            raise ValueError(f"model version {version} failed its checksum: {path} was modified")
+        return model_backends.load_model(path)
+
+    def verify(self):
+        """{version: True if the artifact still matches its checksum}."""
+        results = {}
+        for entry in self.versions():
+            path = os.path.join(self.version_dir(entry["version"]), entry["file"])
+            results[entry["version"]] = os.path.exists(path) and file_utils.file_sha256(path) == entry["sha256"]
+        return results
+
+    # --- Stages ---
+    def stages(self):
+        """{"production": {...} or None, "shadow": ..., "history": [...]} as stored in stages.json."""
+        try:
+            with open(self.stages_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {stage: None for stage in STAGES} | {"history": []}
+
+    def stage(self, stage="production"):
+        """Version currently promoted to stage, or None."""
+        assignment = self.stages().get(stage)
+        return assignment["version"] if assignment else None
+
+    def promote(self, version, stage="production"):
+        """Point stage at version, atomically. Live models pick it up on their next check."""
+        if version is not None:
+            self.get(version)
+        os.makedirs(self.root, exist_ok=True)
+        with _locked(self.lock_path):
+            stages = self.stages()
+            promoted = time.strftime("%Y-%m-%dT%H:%M:%S")
+            stages[stage] = {"version": version, "promoted": promoted} if version is not None else None
+            stages["history"].append({"stage": stage, "version": version, "at": promoted})
+            with tempfile.NamedTemporaryFile("w", dir=self.root, prefix=".stages-", suffix=".tmp",
+                                             delete=False) as f:
+                json.dump(stages, f, indent=2)
+            try:
+                os.replace(f.name, self.stages_path)
+            except BaseException:
+                os.unlink(f.name)
+                raise
+
+    def clear(self, stage):
+        self.promote(None, stage)
+
+
+# --- Hot reload ---
+class LiveModel:
+    """The model promoted to one stage, swapped atomically when the promotion changes."""
+
+    def __init__(self, registry, stage="production", check_interval=1.0):
+        self.registry = registry
+        self.stage = stage
+        self.check_interval = check_interval
+        self.swaps = 0
+        self._deployment = None
+        self._fingerprint = None
+        self._next_check = 0.0
+        self._loading = threading.Lock()
+
+    def current(self):
+        """The Deployment serving this stage right now, or None if nothing is promoted."""
+        now = time.monotonic()
+        if now >= self._next_check:
+            self._next_check = now + self.check_interval
+            self._check()
+        return self._deployment
+
+    def _check(self):
+        try:
+            fingerprint = prediction_cache.file_fingerprint(self.registry.stages_path)
+        except OSError:
+            fingerprint = None
+        if fingerprint == self._fingerprint:
+            return
+        if self._deployment is None:
+            # Nothing to serve yet, so the first load happens in the caller
+            with self._loading:
+                self._reload(fingerprint)
+        elif self._loading.acquire(blocking=False):
+            threading.Thread(target=self._reload_and_release, args=(fingerprint,), daemon=True).start()
+
+    def _reload_and_release(self, fingerprint):
+        try:
+            self._reload(fingerprint)
+        finally:
+            self._loading.release()
+
+    def _reload(self, fingerprint):
+        try:
+            version = self.registry.stage(self.stage)
+            deployment = self._deployment
+            if version is None:
+                deployment = None
+            elif deployment is None or deployment.version != version:
+                entry = self.registry.get(version)
+                deployment = Deployment(version, entry["sha256"], self.registry.artifact_path(version),
+                                        self.registry.load(version))
+        except (OSError, ValueError) as e:
+            # Keep serving what we have; the next check retries
+            print(f"model registry: could not load {self.stage} model: {e}", file=sys.stderr)
+            return
+        if deployment is not self._deployment and self._deployment is not None:
+            self.swaps += 1
+        self._deployment = deployment
+        self._fingerprint = fingerprint
+
+
+# --- Shadow scoring ---
+class ShadowScorer:
+    """Scores requests with a candidate model off the request path and logs the differences."""
+
+    def __init__(self, shadow, log_path=SHADOW_LOG_PATH, max_workers=2, max_pending=1000):
+        self.shadow = shadow
+        self.log_path = log_path
+        self.max_pending = max_pending
+        self.rows = 0
+        self.dropped = 0
+        self.failed = 0
+        self.decision_flips = 0
+        self.abs_diff_sum = 0.0
+        self.max_abs_diff = 0.0
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._pool = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="shadow")
+
+    def submit(self, features, proba_primary, primary_version=None, source="app", mapping=None):
+        """Queue rows for shadow scoring and return at once.
+
+        features is a frame of FEATURE_COLUMNS, or one applicant's feature dict;
+        proba_primary holds the primary model's repayment probabilities and
+        mapping the ScoreMapping its decisions were served with (None: linear).
+        """
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.dropped += 1
+                return
+            self._pending += 1
+        self._pool.submit(self._score, features, proba_primary, primary_version, source, datetime.datetime.now(),
+                          mapping)
+
+    def _score(self, features, proba_primary, primary_version, source, timestamp, mapping):
+        import pandas as pd
+
+        try:
+            deployment = self.shadow.current()
+            if deployment is None:
+                return
+            if isinstance(features, dict):
+                features = pd.DataFrame({col: [features[col]] for col in scoring_core.FEATURE_COLUMNS})
+            proba_primary = np.atleast_1d(np.asarray(proba_primary, dtype=float))
+            proba_shadow = deployment.model.predict_proba(features)[:, 1]
+            score_primary = np.atleast_1d(scoring_core.credit_score(proba_primary))
+            score_shadow = np.atleast_1d(scoring_core.credit_score(proba_shadow))
+            decision_primary = np.atleast_1d(
+                scoring_core.decision(scoring_core.credit_score(proba_primary, mapping), mapping))
+            decision_shadow = np.atleast_1d(
+                scoring_core.decision(scoring_core.credit_score(proba_shadow, mapping), mapping))
+            diff = score_shadow - score_primary
+            stamp = timestamp.strftime(audit_log.TIMESTAMP_FORMAT)
+            with self._lock:
+                self.rows += len(diff)
+                self.decision_flips += int(np.count_nonzero(decision_primary != decision_shadow))
+                self.abs_diff_sum += float(np.abs(diff).sum())
+                self.max_abs_diff = max(self.max_abs_diff, float(np.abs(diff).max()))
+                new_file = not os.path.exists(self.log_path)
+                with open(self.log_path, "a", newline="") as f:
+                    writer = csv.writer(f)
+                    if new_file:
+                        writer.writerow(SHADOW_LOG_COLUMNS)
+                    for i in range(len(diff)):
+                        writer.writerow([
+                            stamp, source, primary_version, deployment.version,
+                            repr(float(proba_primary[i])), repr(float(proba_shadow[i])), round(float(diff[i]), 4),
+                            decision_primary[i], decision_shadow[i],
+                        ])
+        except Exception as e:
+            with self._lock:
+                self.failed += 1
+            print(f"shadow scoring failed: {e}", file=sys.stderr)
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def stats(self):
+        deployment = self.shadow.current()
+        with self._lock:
+            return {
+                "shadow_version": deployment.version if deployment is not None else None,
+                "rows": self.rows,
+                "mean_abs_score_diff": self.abs_diff_sum / self.rows if self.rows else 0.0,
+                "max_abs_score_diff": self.max_abs_diff,
+                "decision_flips": self.decision_flips,
+                "pending": self._pending,
+                "dropped": self.dropped,
+                "failed": self.failed,
+            }
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Versioned model registry with staged promotion.")
+    parser.add_argument("--registry", default=REGISTRY_DIR)
+    sub = parser.add_subparsers(dest="command", required=True)
+    register = sub.add_parser("register", help="add a model file as the next version")
+    register.add_argument("path")
+    register.add_argument("--description", default="")
+    register.add_argument("--promote", nargs="?", const="production", choices=STAGES, metavar="STAGE",
+                          help="promote the new version right away (default stage: production)")
+    sub.add_parser("list", help="registered versions and their stages")
+    promote = sub.add_parser("promote", help="serve a version in a stage")
+    promote.add_argument("version", type=int)
+    promote.add_argument("--stage", choices=STAGES, default="production")
+    clear = sub.add_parser("clear", help="stop serving a stage")
+    clear.add_argument("--stage", choices=STAGES, required=True)
+    sub.add_parser("verify", help="check every artifact against its recorded SHA-256")
+    args = parser.parse_args(argv)
+
+    registry = ModelRegistry(args.registry)
+    if args.command == "register":
+        if not os.path.exists(args.path):
+            parser.error(f"model file '{args.path}' not found")
+        version = registry.register(args.path, description=args.description)
+        print(f"Registered {args.path} as version {version}")
+        if args.promote:
+            registry.promote(version, args.promote)
+            print(f"Promoted version {version} to {args.promote}")
+    elif args.command == "list":
+        stages = registry.stages()
+        serving = {stages[stage]["version"]: stage for stage in STAGES if stages.get(stage)}
+        for entry in registry.versions():
+            print(f"v{entry['version']:<4d} {entry['created']}  {entry['sha256'][:12]}  {entry['file']:28s} "
+                  f"{serving.get(entry['version'], ''):10s} {entry['description']}")
+    elif args.command == "promote":
+        registry.promote(args.version, args.stage)
+        print(f"Promoted version {args.version} to {args.stage}")
+    elif args.command == "clear":
+        registry.clear(args.stage)
+        print(f"Cleared {args.stage}")
+    else:
+        results = registry.verify()
+        for version, ok in results.items():
+            print(f"v{version:<4d} {'ok' if ok else 'CHECKSUM MISMATCH'}")
+        if not all(results.values()):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
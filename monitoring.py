@@ -0,0 +1,261 @@
+# monitoring.py
+"""Population stability and score-drift monitoring for scored traffic.
+
+A reference is captured once from the training loans (trainperf.csv plus
+trainprevloans.csv, see feature_store.py) scored by the served model:
+
+- numeric inputs and the credit score: decile bin edges and the share of
+  training rows in each bin
+- categorical inputs: the share of each form choice (plus "other")
+
+DriftMonitor folds scored rows into fixed-size count arrays with the same
+bins, so memory is constant and each row costs one bisect per feature
+(vectorized with searchsorted/bincount for batches). PSI and a binned KS
+statistic are computed from the counts on demand, in O(bins).
+
+The monitored credit_score is the linear score of the model's raw
+probability, not the calibrated one from a score mapping, so refitting the
+mapping (calibration.py) does not show up as drift.
+
+Thresholds follow the usual PSI reading: < 0.1 stable, 0.1-0.25 drifting,
+> 0.25 shifted. KS (max CDF gap across bins, numeric columns only) alerts
+above 0.1. Nothing is reported until MIN_ROWS rows have been seen.
+
+Usage:
+    python monitoring.py build-reference [--model logistic_loan_default.pkl]
+    python monitoring.py check scored.csv       # exits 1 if any alert fires
+"""
+
+import argparse
+import bisect
+import json
+import sys
+import threading
+import time
+
+import numpy as np
+
+import scoring_core
+
+REFERENCE_PATH = "monitoring_reference.json"
+MONITORED_NUMERIC = scoring_core.NUMERIC_INPUTS + ["credit_score"]
+MONITORED_CATEGORICAL = scoring_core.CATEGORICAL_INPUTS
+OTHER_CATEGORY = "other"
+N_BINS = 10
+
+PSI_WARN = 0.1
+PSI_ALERT = 0.25
+KS_ALERT = 0.1
+MIN_ROWS = 500
+# Floor on bin shares so empty bins don't make PSI infinite
+PSI_EPSILON = 1e-4
+
+
+# --- Reference ---
+def quantile_edges(values, n_bins=N_BINS):
+    """Interior bin edges at the reference quantiles; ties collapse to fewer bins."""
+    values = np.asarray(values, dtype=float)
+    values = values[np.isfinite(values)]
+    return np.unique(np.quantile(values, np.linspace(0, 1, n_bins + 1)[1:-1])).tolist()
+
+
+def numeric_counts(values, edges):
+    """Rows per bin for the bins split at edges; NaNs are not counted."""
+    values = np.asarray(values, dtype=float)
+    values = values[~np.isnan(values)]
+    return np.bincount(np.searchsorted(edges, values, side="right"), minlength=len(edges) + 1)
+
+
+def categorical_counts(values, categories):
+    """Rows per category in categories, with unknown values counted in the last slot."""
+    values = np.asarray(values, dtype=object)
+    counts = np.array([np.count_nonzero(values == category) for category in categories] + [0])
+    counts[-1] = len(values) - counts.sum()
+    return counts
+
+
+def build_reference(model, model_path=None):
+    """Reference bins and shares from the training loans scored by model."""
+    import batch_scoring
+    import feature_store
+
+    frame = feature_store.load_training_frame()
+    columns = dict(batch_scoring.feature_frame(frame[scoring_core.INPUT_COLUMNS]))
+    columns["credit_score"] = scoring_core.credit_score(model.predict_proba(batch_scoring.feature_frame(frame))[:, 1])
+
+    reference = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "model_path": model_path,
+        "rows": int(len(frame)),
+        "numeric": {},
+        "categorical": {},
+    }
+    for col in MONITORED_NUMERIC:
+        edges = quantile_edges(columns[col])
+        counts = numeric_counts(columns[col], edges)
+        reference["numeric"][col] = {"edges": edges, "shares": (counts / counts.sum()).tolist()}
+    for col in MONITORED_CATEGORICAL:
+        categories = list(scoring_core.FIELD_CHOICES[col])
+        counts = categorical_counts(columns[col], categories)
+        reference["categorical"][col] = {"categories": categories, "shares": (counts / counts.sum()).tolist()}
+    return reference
+
+
+def save_reference(reference, path=REFERENCE_PATH):
+    with open(path, "w") as f:
+        json.dump(reference, f, indent=2)
+
+
+def load_reference(path=REFERENCE_PATH):
+    with open(path) as f:
+        return json.load(f)
+
+
+# --- Statistics ---
+def psi(expected_shares, actual_counts):
+    """Population stability index of actual counts against reference shares."""
+    expected = np.maximum(np.asarray(expected_shares, dtype=float), PSI_EPSILON)
+    actual = np.maximum(actual_counts / actual_counts.sum(), PSI_EPSILON)
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+
+def binned_ks(expected_shares, actual_counts):
+    """Largest gap between the reference and actual CDFs at the bin edges."""
+    expected = np.cumsum(expected_shares)
+    actual = np.cumsum(actual_counts / actual_counts.sum())
+    return float(np.max(np.abs(actual - expected)))
+
+
+# --- Streaming monitor ---
+class DriftMonitor:
+    """Fixed-memory histograms of scored traffic compared against a reference."""
+
+    def __init__(self, reference, min_rows=MIN_ROWS):
+        self.reference = reference
+        self.min_rows = min_rows
+        self._numeric = [(col, spec["edges"]) for col, spec in reference["numeric"].items()]
+        self._categorical = [
+            (col, {category: i for i, category in enumerate(spec["categories"])}, len(spec["categories"]))
+            for col, spec in reference["categorical"].items()
+        ]
+        self._lock = threading.Lock()
+        self.reset()
+
+    @classmethod
+    def from_file(cls, path=REFERENCE_PATH, **kwargs):
+        return cls(load_reference(path), **kwargs)
+
+    def reset(self):
+        with self._lock:
+            self.rows = 0
+            self.counts = {col: np.zeros(len(edges) + 1, dtype=np.int64) for col, edges in self._numeric}
+            self.counts.update({col: np.zeros(n + 1, dtype=np.int64) for col, _, n in self._categorical})
+
+    def update(self, columns, credit_score):
+        """Fold a batch of scored rows in: columns holds the inputs, credit_score the scores."""
+        batch = {}
+        for col, edges in self._numeric:
+            values = credit_score if col == "credit_score" else columns[col]
+            batch[col] = numeric_counts(values, edges)
+        for col, _, _ in self._categorical:
+            batch[col] = categorical_counts(columns[col], self.reference["categorical"][col]["categories"])
+        with self._lock:
+            self.rows += len(np.atleast_1d(credit_score))
+            for col, counts in batch.items():
+                self.counts[col] += counts
+
+    def update_one(self, row, credit_score):
+        """Fold in one scored applicant (a dict of inputs) without NumPy overhead."""
+        with self._lock:
+            self.rows += 1
+            for col, edges in self._numeric:
+                value = credit_score if col == "credit_score" else row[col]
+                if value == value:
+                    self.counts[col][bisect.bisect_right(edges, value)] += 1
+            for col, positions, n in self._categorical:
+                self.counts[col][positions.get(row[col], n)] += 1
+
+    def report(self):
+        """PSI, KS and status per monitored column."""
+        with self._lock:
+            rows = self.rows
+            counts = {col: values.copy() for col, values in self.counts.items()}
+        columns = {}
+        for kind in ("numeric", "categorical"):
+            for col, spec in self.reference[kind].items():
+                entry = {"rows": int(counts[col].sum()), "psi": None, "ks": None, "status": "insufficient data"}
+                if entry["rows"] >= self.min_rows:
+                    entry["psi"] = psi(spec["shares"], counts[col])
+                    if kind == "numeric":
+                        entry["ks"] = binned_ks(spec["shares"], counts[col])
+                    entry["status"] = self._status(entry["psi"], entry["ks"])
+                columns[col] = entry
+        return {"rows": rows, "columns": columns}
+
+    @staticmethod
+    def _status(psi_value, ks_value):
+        if psi_value > PSI_ALERT or (ks_value is not None and ks_value > KS_ALERT):
+            return "alert"
+        if psi_value > PSI_WARN:
+            return "warn"
+        return "stable"
+
+    def alerts(self, report=None):
+        """Human-readable messages for every column past a threshold."""
+        report = report or self.report()
+        messages = []
+        for col, entry in report["columns"].items():
+            if entry["status"] in ("warn", "alert"):
+                ks = f", KS {entry['ks']:.3f}" if entry["ks"] is not None else ""
+                messages.append(f"{entry['status'].upper()}: {col} PSI {entry['psi']:.3f}{ks}")
+        return messages
+
+
+def print_report(report):
+    print(f"{report['rows']} rows monitored")
+    print(f"{'column':28s} {'PSI':>8s} {'KS':>8s}  status")
+    for col, entry in report["columns"].items():
+        psi_text = f"{entry['psi']:8.3f}" if entry["psi"] is not None else f"{'-':>8s}"
+        ks_text = f"{entry['ks']:8.3f}" if entry["ks"] is not None else f"{'-':>8s}"
+        print(f"{col:28s} {psi_text} {ks_text}  {entry['status']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Population stability and score-drift monitoring.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("build-reference", help="capture reference histograms from the training loans")
+    build.add_argument("--model", default="logistic_loan_default.pkl")
+    build.add_argument("--output", default=REFERENCE_PATH)
+
+    check = sub.add_parser("check", help="drift of a scored CSV (batch_scoring.py output) against the reference")
+    check.add_argument("scored", help="CSV with the form fields and a proba_good column (batch_scoring.py output)")
+    check.add_argument("--reference", default=REFERENCE_PATH)
+    check.add_argument("--chunksize", type=int, default=100000)
+    args = parser.parse_args(argv)
+
+    if args.command == "build-reference":
+        import model_backends
+
+        reference = build_reference(model_backends.load_model(args.model), model_path=args.model)
+        save_reference(reference, args.output)
+        print(f"Reference from {reference['rows']} training loans written to {args.output}")
+        return
+
+    import pandas as pd
+
+    monitor = DriftMonitor.from_file(args.reference)
+    for chunk in pd.read_csv(args.scored, chunksize=args.chunksize):
+        scored = chunk[chunk["proba_good"].notna()]
+        monitor.update(scored, scoring_core.credit_score(scored["proba_good"].to_numpy()))
+    report = monitor.report()
+    print_report(report)
+    alerts = monitor.alerts(report)
+    for message in alerts:
+        print(message)
+    if alerts:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
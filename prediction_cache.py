@@ -0,0 +1,137 @@
+# prediction_cache.py
+"""Bounded LRU + TTL cache of model predictions keyed on the applicant's features.
+
+The key is a hash of the canonical 19-column feature vector (see
+scoring_core.FEATURE_COLUMNS): numbers are normalized to float so 50000 and
+50000.0 share an entry. The cache watches the model file and clears itself
+when the file changes, so a retrained model never serves stale scores.
+
+One cache instance is meant to be shared by every session in the process
+(the Streamlit app keeps it in st.cache_resource); all methods are
+thread-safe.
+"""
+
+import collections
+import hashlib
+import os
+import threading
+import time
+
+import scoring_core
+
+
+def file_fingerprint(path):
+    """(size, mtime_ns) of a file; changes whenever the file is rewritten."""
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def feature_key(features, columns=scoring_core.FEATURE_COLUMNS):
+    """Stable hash of one applicant's feature values."""
+    parts = []
+    for col in columns:
+        value = features[col]
+        if isinstance(value, str):
+            parts.append(f"{col}=s:{value}")
+        else:
+            parts.append(f"{col}=f:{float(value)!r}")
+    return hashlib.blake2b("|".join(parts).encode(), digest_size=16).hexdigest()
+
+
+class PredictionCache:
+    """LRU cache with per-entry expiry and hit/miss counters."""
+
+    def __init__(self, maxsize=10000, ttl_seconds=3600.0, model_path=None):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self.model_path = model_path
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._fingerprint = self._model_fingerprint()
+        self._model_id = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _model_fingerprint(self):
+        """Fingerprint of the watched model file; None if there is none or it is missing."""
+        if self.model_path is None:
+            return None
+        try:
+            return file_fingerprint(self.model_path)
+        except OSError:
+            return None
+
+    def _check_model(self):
+        """Drop every entry if the model file changed since the last call (lock held)."""
+        if self.model_path is None:
+            return
+        fingerprint = self._model_fingerprint()
+        if fingerprint != self._fingerprint:
+            self._entries.clear()
+            self._fingerprint = fingerprint
+            self.invalidations += 1
+
+    def bind(self, model_id):
+        """Drop every entry if model_id (e.g. the served model's SHA-256) differs from the last one bound."""
+        with self._lock:
+            if model_id != self._model_id:
+                if self._model_id is not None:
+                    self._entries.clear()
+                    self.invalidations += 1
+                self._model_id = model_id
+
+    def get(self, features):
+        """Cached value for these features, or None on a miss."""
+        key = feature_key(features)
+        with self._lock:
+            self._check_model()
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires = entry
+                if expires >= time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+                self.expirations += 1
+            self.misses += 1
+            return None
+
+    def put(self, features, value):
+        key = feature_key(features)
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, features, compute):
+        """Return the cached value, or call compute() and cache its result."""
+        value = self.get(features)
+        if value is None:
+            value = compute()
+            self.put(features, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
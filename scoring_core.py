@@ -0,0 +1,325 @@
+# scoring_core.py
+"""Feature engineering, credit scoring and risk banding for the loan default model.
+
+Everything here is plain Python/NumPy: no streamlit, plotly, pandas or
+sklearn imports, so batch jobs, the HTTP service and benchmarks can import
+it without paying for the UI stack. Functions accept scalars or arrays (or
+a mapping of column -> array such as a DataFrame) and work elementwise.
+"""
+
+import json
+import os
+import sys
+
+import numpy as np
+
+# --- Columns ---
+# Raw applicant fields, as entered in the Streamlit form
+NUMERIC_INPUTS = [
+    "loanamount",
+    "termdays",
+    "repayment_curr_ratio",
+    "num_prev_loans",
+    "avg_repay_delay_days",
+    "total_firstrepaid_late",
+    "avg_prev_repayment_ratio",
+    "avg_duration_days",
+    "avg_prev_interest",
+    "age",
+]
+CATEGORICAL_INPUTS = ["bank_account_type", "employment_status_clients"]
+INPUT_COLUMNS = NUMERIC_INPUTS + CATEGORICAL_INPUTS
+
+DERIVED_COLUMNS = [
+    "repayment_efficiency",
+    "late_payment_rate",
+    "sqrt_loanamount",
+    "sqrt_termdays",
+    "sqrt_avg_prev_interest",
+    "sqrt_repayment_efficiency",
+    "sqrt_late_payment_rate",
+]
+# Column order of the frame passed to model.predict_proba
+FEATURE_COLUMNS = INPUT_COLUMNS + DERIVED_COLUMNS
+
+# Allowed ranges, defaults and choices of the form inputs
+FIELD_RANGES = {
+    "loanamount": (100, 1000000),
+    "termdays": (10, 720),
+    "repayment_curr_ratio": (0.0, 2.0),
+    "num_prev_loans": (0.0, 50.0),
+    "avg_repay_delay_days": (-50.0, 365.0),
+    "total_firstrepaid_late": (0.0, 50.0),
+    "avg_prev_repayment_ratio": (0.0, 2.0),
+    "avg_duration_days": (0.0, 720.0),
+    "avg_prev_interest": (0.0, 100000.0),
+    "age": (18, 100),
+}
+FIELD_DEFAULTS = {
+    "loanamount": 50000,
+    "termdays": 90,
+    "repayment_curr_ratio": 1.0,
+    "num_prev_loans": 3.0,
+    "avg_repay_delay_days": 10.0,
+    "total_firstrepaid_late": 2.0,
+    "avg_prev_repayment_ratio": 1.0,
+    "avg_duration_days": 180.0,
+    "avg_prev_interest": 5000.0,
+    "age": 30,
+    "bank_account_type": "Other",
+    "employment_status_clients": "Permanent",
+}
+FIELD_CHOICES = {
+    "bank_account_type": ["Other", "Savings", "Current"],
+    "employment_status_clients": ["Permanent", "Unknown", "Unemployed", "Self-Employed", "Student", "Retired", "Contract"],
+}
+
+# --- Score mapping ---
+MIN_SCORE, MAX_SCORE = 300, 850
+GOOD_THRESHOLD = 575
+# (lower cutoff, risk level, color, icon), best band first
+RISK_BANDS = [
+    (750, "Excellent", "#10b981", "🟢"),
+    (700, "Good", "#22c55e", "🟢"),
+    (650, "Fair", "#f59e0b", "🟡"),
+    (575, "Poor", "#f97316", "🟠"),
+]
+LOWEST_BAND = ("Very Poor", "#ef4444", "🔴")
+RISK_STYLES = {label: (color, icon) for _, label, color, icon in RISK_BANDS}
+RISK_STYLES[LOWEST_BAND[0]] = LOWEST_BAND[1:]
+SCORE_MAPPING_PATH = "score_mapping.json"
+SCORE_MAPPING_FORMAT = "score-mapping/1"
+
+
+def _unwrap(value):
+    """Return a Python scalar for 0-d results so scalar callers get scalars back."""
+    value = np.asarray(value)
+    return value.item() if value.ndim == 0 else value
+
+
+# --- Feature Engineering ---
+def engineer_features(columns):
+    """Compute the model's derived columns from the raw form inputs.
+
+    columns maps each of INPUT_COLUMNS to a scalar or an array (a dict of
+    form values or a DataFrame both work). Returns a dict with every
+    FEATURE_COLUMNS entry.
+    """
+    repayment_curr_ratio = np.asarray(columns["repayment_curr_ratio"], dtype=float)
+    avg_prev_repayment_ratio = np.asarray(columns["avg_prev_repayment_ratio"], dtype=float)
+    num_prev_loans = np.asarray(columns["num_prev_loans"], dtype=float)
+    total_firstrepaid_late = np.asarray(columns["total_firstrepaid_late"], dtype=float)
+
+    repayment_efficiency = repayment_curr_ratio / (avg_prev_repayment_ratio + 1e-6)
+    late_payment_rate = np.where(num_prev_loans > 0, total_firstrepaid_late / (num_prev_loans + 1e-6), 0.0)
+
+    features = {col: _unwrap(columns[col]) for col in INPUT_COLUMNS}
+    features.update({
+        "repayment_efficiency": _unwrap(repayment_efficiency),
+        "late_payment_rate": _unwrap(late_payment_rate),
+        "sqrt_loanamount": _unwrap(np.sqrt(np.asarray(columns["loanamount"], dtype=float))),
+        "sqrt_termdays": _unwrap(np.sqrt(np.asarray(columns["termdays"], dtype=float))),
+        "sqrt_avg_prev_interest": _unwrap(np.sqrt(np.asarray(columns["avg_prev_interest"], dtype=float))),
+        "sqrt_repayment_efficiency": _unwrap(np.sqrt(np.abs(repayment_efficiency))),
+        "sqrt_late_payment_rate": _unwrap(np.sqrt(late_payment_rate)),
+    })
+    return features
+
+
+# --- Score mapping ---
+class ScoreMapping:
+    """A fitted score mapping: probability calibration, decision threshold and band cutoffs.
+
+    calibration is {"method": "isotonic", "x": [...], "y": [...]} (piecewise
+    linear, non-decreasing) or {"method": "platt", "a": a, "b": b} (logistic in
+    the model's logit). Written by calibration.py; see SCORE_MAPPING_PATH.
+    """
+
+    def __init__(self, calibration, good_threshold, band_cutoffs, version=None, **metadata):
+        self.calibration = calibration
+        self.good_threshold = float(good_threshold)
+        self.band_cutoffs = [float(cutoff) for cutoff in band_cutoffs]
+        self.version = version
+        self.metadata = metadata
+
+    @classmethod
+    def from_dict(cls, config):
+        if config.get("format") != SCORE_MAPPING_FORMAT:
+            raise ValueError(f"not a {SCORE_MAPPING_FORMAT} config")
+        config = {key: value for key, value in config.items() if key != "format"}
+        return cls(**config)
+
+    def to_dict(self):
+        return dict(format=SCORE_MAPPING_FORMAT, version=self.version, calibration=self.calibration,
+                    good_threshold=self.good_threshold, band_cutoffs=self.band_cutoffs, **self.metadata)
+
+    def matches_model(self, sha256):
+        """Whether the mapping was fitted for the model file with this SHA-256 (True if it records none)."""
+        models = self.metadata.get("models")
+        return not models or any(model["sha256"] == sha256 for model in models)
+
+    def calibrate(self, proba_good):
+        """Calibrated repayment probability for raw model probabilities."""
+        proba_good = np.asarray(proba_good, dtype=float)
+        if self.calibration["method"] == "isotonic":
+            return np.interp(proba_good, self.calibration["x"], self.calibration["y"])
+        clipped = np.clip(proba_good, 1e-12, 1 - 1e-12)
+        logit = np.log(clipped / (1 - clipped))
+        return 1.0 / (1.0 + np.exp(-(self.calibration["a"] * logit + self.calibration["b"])))
+
+    def raw_proba_at(self, calibrated):
+        """Smallest raw model probability whose calibrated value reaches calibrated (inf if none does).
+
+        Calibration is non-decreasing, so every raw probability at or above it reaches it too.
+        """
+        if self.calibration["method"] == "isotonic":
+            x = np.asarray(self.calibration["x"], dtype=float)
+            y = np.asarray(self.calibration["y"], dtype=float)
+            i = int(np.searchsorted(y, calibrated, side="left"))
+            if i >= len(y):
+                return float("inf")
+            if i == 0:
+                return 0.0
+            return float(x[i - 1] + (calibrated - y[i - 1]) * (x[i] - x[i - 1]) / (y[i] - y[i - 1]))
+        target = np.log(calibrated / (1 - calibrated))
+        logit = (target - self.calibration["b"]) / self.calibration["a"]
+        return float(1.0 / (1.0 + np.exp(-logit)))
+
+
+def load_score_mapping(path=SCORE_MAPPING_PATH):
+    """The ScoreMapping saved at path, or None (the linear defaults) if there is none."""
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return ScoreMapping.from_dict(json.load(f))
+
+
+def mapping_for_model(mapping, sha256, log=sys.stderr):
+    """mapping if it was fitted for the model with this SHA-256, else None (the linear defaults).
+
+    A mapping's calibration, threshold and bands only hold for the model it
+    was fitted on, so a mismatch falls back to the linear scale with a warning.
+    """
+    if mapping is None or mapping.matches_model(sha256):
+        return mapping
+    print(f"score mapping v{mapping.version} was not fitted for model {sha256[:12]}; "
+          f"using the linear 300-850 scale (refit with calibration.py)", file=log)
+    return None
+
+
+# --- Scoring ---
+# Every function below takes an optional ScoreMapping; None means the original
+# linear 300-850 mapping with GOOD_THRESHOLD and the RISK_BANDS cutoffs.
+def good_threshold(mapping=None):
+    return mapping.good_threshold if mapping is not None else GOOD_THRESHOLD
+
+
+def band_cutoffs(mapping=None):
+    """Lowest score of each RISK_BANDS band, best band first."""
+    return list(mapping.band_cutoffs) if mapping is not None else [cutoff for cutoff, *_ in RISK_BANDS]
+
+
+def calibrated_proba(proba_good, mapping=None):
+    """Repayment probability after the mapping's calibration (unchanged without one)."""
+    if mapping is None:
+        return _unwrap(np.asarray(proba_good, dtype=float))
+    return _unwrap(mapping.calibrate(proba_good))
+
+
+def credit_score(proba_good, mapping=None):
+    """Map the (calibrated) repayment probability linearly onto the 300-850 score range."""
+    proba_good = np.asarray(calibrated_proba(proba_good, mapping), dtype=float)
+    return _unwrap(MIN_SCORE + (MAX_SCORE - MIN_SCORE) * proba_good)
+
+
+def risk_level(score, mapping=None):
+    """Risk band label ("Excellent" ... "Very Poor") for each score."""
+    score = np.asarray(score, dtype=float)
+    conditions = [score >= cutoff for cutoff in band_cutoffs(mapping)]
+    labels = [label for _, label, *_ in RISK_BANDS]
+    return _unwrap(np.select(conditions, labels, default=LOWEST_BAND[0]))
+
+
+def risk_style(level):
+    """(color, icon) used by the app for a risk band label."""
+    return RISK_STYLES[level]
+
+
+def classification(score, mapping=None):
+    """"Good" at or above the decision threshold, otherwise "Bad"."""
+    return _unwrap(np.where(np.asarray(score, dtype=float) >= good_threshold(mapping), "Good", "Bad"))
+
+
+def decision(score, mapping=None):
+    """"Approve" at or above the decision threshold, otherwise "Decline"."""
+    return _unwrap(np.where(np.asarray(score, dtype=float) >= good_threshold(mapping), "Approve", "Decline"))
+
+
+def summarize(proba_good, mapping=None):
+    """Score, risk level and decision for each repayment probability."""
+    score = credit_score(proba_good, mapping)
+    return {
+        "proba_good": _unwrap(proba_good),
+        "credit_score": score,
+        "risk_level": risk_level(score, mapping),
+        "decision": decision(score, mapping),
+    }
+
+
+# --- Risk factors ---
+def risk_factors(columns):
+    """Heuristic risk-factor breakdown shown in the app's factor chart.
+
+    columns needs the form inputs plus late_payment_rate (see
+    engineer_features). Each value is a percentage-like impact.
+    """
+    avg_repay_delay_days = np.asarray(columns["avg_repay_delay_days"], dtype=float)
+    total_firstrepaid_late = np.asarray(columns["total_firstrepaid_late"], dtype=float)
+    repayment_curr_ratio = np.asarray(columns["repayment_curr_ratio"], dtype=float)
+    loanamount = np.asarray(columns["loanamount"], dtype=float)
+    termdays = np.asarray(columns["termdays"], dtype=float)
+    late_payment_rate = np.asarray(columns["late_payment_rate"], dtype=float)
+    permanent = np.asarray(columns["employment_status_clients"]) == "Permanent"
+
+    return {
+        "Payment History": _unwrap(np.clip(20 + avg_repay_delay_days * 2 + total_firstrepaid_late * 5, 5, 45)),
+        "Repayment Capacity": _unwrap(np.clip((2 - repayment_curr_ratio) * 15, 5, 35)),
+        "Loan Characteristics": _unwrap(np.clip(loanamount / 10000 + termdays / 50, 5, 25)),
+        "Employment Status": _unwrap(np.where(permanent, 15.0, 25.0)),
+        "Previous Performance": _unwrap(np.clip(late_payment_rate * 30, 5, 30)),
+    }
+
+
+# --- Validation ---
+def validate_applicant(applicant):
+    """Return (errors, warnings) for one applicant dict of form inputs."""
+    errors = []
+    warnings = []
+
+    for field, (low, high) in FIELD_RANGES.items():
+        value = applicant.get(field)
+        if isinstance(value, bool) or not isinstance(value, (int, float, np.integer, np.floating)):
+            errors.append(f"{field} is required and must be a number")
+        elif not low <= value <= high:
+            errors.append(f"{field} must be between {low} and {high}")
+    for field, choices in FIELD_CHOICES.items():
+        if applicant.get(field) not in choices:
+            errors.append(f"{field} must be one of: {', '.join(choices)}")
+    if errors:
+        return errors, warnings
+
+    if applicant["loanamount"] <= 0:
+        errors.append("Loan amount must be positive")
+
+    if applicant["repayment_curr_ratio"] < 0.1:
+        warnings.append("Very low repayment ratio may indicate high risk")
+    elif applicant["repayment_curr_ratio"] < 0.5:
+        warnings.append("Low repayment ratio detected")
+
+    if applicant["avg_repay_delay_days"] > 30:
+        warnings.append("High average payment delay may affect approval")
+
+    if applicant["num_prev_loans"] > 0 and applicant["total_firstrepaid_late"] / applicant["num_prev_loans"] > 0.5:
+        warnings.append("High rate of late first payments detected")
+
+    return errors, warnings
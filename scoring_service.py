@@ -0,0 +1,410 @@
+# scoring_service.py
+"""Machine-facing HTTP scoring service for the loan default model.
+
+The model is loaded once at startup. Concurrent requests are micro-batched:
+applicants that arrive within a few milliseconds of each other are scored
+with a single predict_proba call.
+
+Endpoints:
+    POST /score    one applicant object, a list of them, or {"applicants": [...]}
+    GET  /metrics  p50/p99 latency, request and row counts, throughput
+    GET  /metrics/prometheus  per-stage latency histograms (LOAN_METRICS=1, see instrumentation.py)
+    GET  /drift    PSI/KS per feature and for the score, with alerts (--monitor)
+    GET  /shadow   score differences between the production and shadow models (--shadow)
+    GET  /health
+
+Usage:
+    python scoring_service.py [--host 127.0.0.1] [--port 8080]
+    python scoring_service.py --demo     # in-process load test, no sockets
+    python scoring_service.py --monitor  # track drift against monitoring_reference.json
+    python scoring_service.py --audit    # record every decision in audit_log.sqlite
+    python scoring_service.py --registry --shadow   # serve model_registry.py's production version,
+                                                    # shadow-score with its shadow version
+
+Scores and decisions use the fitted score mapping in score_mapping.json when
+it exists and was fitted for the served model (see calibration.py); /health
+reports its version. Any other model is scored on the linear 300-850 scale.
+
+With --registry, promoting a new version (python model_registry.py promote N)
+swaps the served model without a restart; responses then carry the
+model_version that scored them.
+"""
+
+import argparse
+import asyncio
+import datetime
+import collections
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+import audit_log
+import batch_scoring
+import file_utils
+import instrumentation
+import model_backends
+import model_registry
+import monitoring
+import scoring_core
+
+MODEL_PATH = batch_scoring.MODEL_PATH
+
+
+# --- Metrics ---
+class LatencyStats:
+    """Request latencies over a sliding window plus lifetime counters."""
+
+    def __init__(self, window=10000):
+        self.latencies_ms = collections.deque(maxlen=window)
+        self.started = time.perf_counter()
+        self.requests = 0
+        self.rows = 0
+        self.batches = 0
+
+    def record(self, latency_ms, rows):
+        self.latencies_ms.append(latency_ms)
+        self.requests += 1
+        self.rows += rows
+
+    def snapshot(self):
+        uptime = time.perf_counter() - self.started
+        latencies = np.fromiter(self.latencies_ms, dtype=float) if self.latencies_ms else np.zeros(1)
+        return {
+            "requests": self.requests,
+            "rows": self.rows,
+            "batches": self.batches,
+            "avg_batch_rows": self.rows / self.batches if self.batches else 0.0,
+            "p50_ms": float(np.percentile(latencies, 50)),
+            "p99_ms": float(np.percentile(latencies, 99)),
+            "throughput_rows_per_sec": self.rows / uptime if uptime > 0 else 0.0,
+            "uptime_sec": uptime,
+        }
+
+
+# --- Micro-batching scorer ---
+class MicroBatcher:
+    """Collects applicants from concurrent requests and scores them together.
+
+    A batch is sent to the model as soon as max_batch applicants are waiting
+    or max_wait_ms has passed since the first one arrived.
+    """
+
+    def __init__(self, model, stats, max_batch=512, max_wait_ms=2.0, monitor=None, shadow=None, mapping_for=None):
+        """mapping_for(deployment) gives the ScoreMapping served for a batch, for shadow decisions."""
+        self.model = model
+        self.stats = stats
+        self.monitor = monitor
+        self.shadow = shadow
+        self.mapping_for = mapping_for or (lambda deployment: None)
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = asyncio.Queue()
+        self._worker = None
+
+    def start(self):
+        if self._worker is None:
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    async def submit(self, applicants):
+        """Queue applicants and wait for ([proba_good], deployment) results.
+
+        deployment is the registry version that scored them, or None for a plain model.
+        """
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((applicants, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            pending = [await self._queue.get()]
+            n_rows = len(pending[0][0])
+            deadline = loop.time() + self.max_wait
+            while n_rows < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                pending.append(item)
+                n_rows += len(item[0])
+
+            rows = [applicant for applicants, _ in pending for applicant in applicants]
+            try:
+                # predict_proba releases the event loop so the next batch can fill meanwhile
+                proba_good, deployment = await loop.run_in_executor(None, self._predict, rows)
+            except Exception as e:
+                for _, future in pending:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.stats.batches += 1
+            offset = 0
+            for applicants, future in pending:
+                if not future.done():
+                    future.set_result((proba_good[offset:offset + len(applicants)], deployment))
+                offset += len(applicants)
+
+    def _predict(self, rows):
+        # One deployment per batch, so a promotion never splits a batch across versions
+        deployment = self.model.current() if isinstance(self.model, model_registry.LiveModel) else None
+        model = deployment.model if deployment is not None else self.model
+        if isinstance(model, model_registry.LiveModel):
+            raise ValueError("no model version is promoted to production")
+        with instrumentation.profile_once():
+            with instrumentation.timer("dataframe"):
+                df = pd.DataFrame.from_records(rows, columns=scoring_core.INPUT_COLUMNS)
+            with instrumentation.timer("features"):
+                features = batch_scoring.feature_frame(df)
+            proba_good = instrumentation.predict_proba(model, features)[:, 1]
+        if self.shadow is not None:
+            self.shadow.submit(features, proba_good, primary_version=deployment.version if deployment else None,
+                               source="service", mapping=self.mapping_for(deployment))
+        if self.monitor is not None:
+            self.monitor.update(df, scoring_core.credit_score(proba_good))
+        return proba_good, deployment
+
+
+class ScoringService:
+    """Request handling independent of the transport, so it can be driven in-process."""
+
+    def __init__(self, model, max_batch=512, max_wait_ms=2.0, monitor=None, audit=None, model_version=None,
+                 mapping=None, shadow=None):
+        """model is a loaded model or a model_registry.LiveModel; shadow a model_registry.ShadowScorer."""
+        self.stats = LatencyStats()
+        self.mapping = mapping
+        self._mappings = {}  # registry version SHA-256 -> mapping to use for it
+        self.monitor = monitor
+        self.audit = audit
+        self.model_version = model_version
+        self.shadow = shadow
+        self.batcher = MicroBatcher(model, self.stats, max_batch=max_batch, max_wait_ms=max_wait_ms, monitor=monitor,
+                                    shadow=shadow, mapping_for=self.mapping_for)
+
+    def mapping_for(self, deployment):
+        """The score mapping for a registry deployment, None if it was fitted for another model."""
+        if deployment is None:
+            return self.mapping
+        if deployment.sha256 not in self._mappings:
+            self._mappings[deployment.sha256] = scoring_core.mapping_for_model(self.mapping, deployment.sha256)
+        return self._mappings[deployment.sha256]
+
+    async def score(self, applicants):
+        """Validate and score a list of applicant dicts; results keep the input order."""
+        start = time.perf_counter()
+        results = [None] * len(applicants)
+        valid_positions = []
+        for i, applicant in enumerate(applicants):
+            errors, warnings = scoring_core.validate_applicant(applicant) if isinstance(applicant, dict) else (
+                ["applicant must be a JSON object"], [])
+            if errors:
+                results[i] = {"errors": errors, "warnings": warnings}
+            else:
+                results[i] = {"warnings": warnings}
+                valid_positions.append(i)
+
+        if valid_positions:
+            proba_good, deployment = await self.batcher.submit([applicants[i] for i in valid_positions])
+            summary = scoring_core.summarize(proba_good, self.mapping_for(deployment))
+            scored_at = datetime.datetime.now()
+            model_version = deployment.sha256 if deployment is not None else self.model_version
+            for j, i in enumerate(valid_positions):
+                results[i].update({
+                    "proba_good": float(summary["proba_good"][j]),
+                    "credit_score": round(float(summary["credit_score"][j]), 2),
+                    "risk_level": str(summary["risk_level"][j]),
+                    "decision": str(summary["decision"][j]),
+                })
+                if deployment is not None:
+                    results[i]["model_version"] = deployment.version
+                if self.audit is not None:
+                    self.audit.record(applicants[i], summary["proba_good"][j], summary["credit_score"][j],
+                                      summary["risk_level"][j], summary["decision"][j],
+                                      model_version=model_version, source="service", timestamp=scored_at)
+
+        self.stats.record((time.perf_counter() - start) * 1000.0, len(valid_positions))
+        return results
+
+    async def handle(self, method, path, body=b""):
+        """Route one request; returns (status_code, payload): a JSON-able object, or text for Prometheus."""
+        if method == "GET" and path == "/health":
+            deployment = self.batcher.model.current() if isinstance(self.batcher.model, model_registry.LiveModel) else None
+            mapping = self.mapping_for(deployment)
+            return 200, {
+                "status": "ok",
+                "model_version": deployment.version if deployment is not None else None,
+                "score_mapping": mapping.version if mapping is not None else None,
+            }
+        if method == "GET" and path == "/metrics":
+            return 200, self.stats.snapshot()
+        if method == "GET" and path == "/metrics/prometheus":
+            return 200, instrumentation.render()
+        if method == "GET" and path == "/drift":
+            if self.monitor is None:
+                return 404, {"error": "drift monitoring is off; start the service with --monitor"}
+            report = self.monitor.report()
+            return 200, dict(report, alerts=self.monitor.alerts(report))
+        if method == "GET" and path == "/shadow":
+            if self.shadow is None:
+                return 404, {"error": "shadow scoring is off; start the service with --registry --shadow"}
+            return 200, self.shadow.stats()
+        if method == "POST" and path == "/score":
+            try:
+                payload = json.loads(body or b"null")
+            except ValueError:
+                return 400, {"error": "request body must be JSON"}
+            single = isinstance(payload, dict) and "applicants" not in payload
+            if single:
+                applicants = [payload]
+            elif isinstance(payload, dict):
+                applicants = payload["applicants"]
+            else:
+                applicants = payload
+            if not isinstance(applicants, list):
+                return 400, {"error": "expected an applicant object or a list of them"}
+            results = await self.score(applicants)
+            return 200, results[0] if single else {"results": results}
+        return 404, {"error": f"no route for {method} {path}"}
+
+
+# --- HTTP transport ---
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 500: "Internal Server Error"}
+
+
+async def _serve_connection(service, reader, writer):
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line:
+                break
+            method, path, _ = request_line.decode("latin-1").split(" ", 2)
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+            body = await reader.readexactly(int(headers.get("content-length", 0)))
+
+            try:
+                status, payload = await service.handle(method, path.split("?", 1)[0], body)
+            except Exception as e:
+                status, payload = 500, {"error": str(e)}
+            if isinstance(payload, str):
+                data, content_type = payload.encode(), "text/plain; version=0.0.4"
+            else:
+                data, content_type = json.dumps(payload).encode(), "application/json"
+            writer.write(
+                f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                f"Content-Type: {content_type}\r\nContent-Length: {len(data)}\r\n\r\n".encode() + data
+            )
+            await writer.drain()
+            if headers.get("connection", "").lower() == "close":
+                break
+    except (ValueError, asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(model, host="127.0.0.1", port=8080, **batch_options):
+    service = ScoringService(model, **batch_options)
+    server = await asyncio.start_server(lambda r, w: _serve_connection(service, r, w), host, port)
+    print(f"Scoring service listening on http://{host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+# --- In-process demo ---
+async def demo(model, n_requests=2000, concurrency=200, **service_options):
+    """Fire concurrent single-applicant requests through the service without any sockets."""
+    service = ScoringService(model, **service_options)
+    applicant = dict(scoring_core.FIELD_DEFAULTS)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one_request():
+        async with semaphore:
+            return await service.handle("POST", "/score", json.dumps(applicant).encode())
+
+    responses = await asyncio.gather(*(one_request() for _ in range(n_requests)))
+    await service.batcher.stop()
+    print("sample response:", responses[0])
+    _, metrics = await service.handle("GET", "/metrics")
+    print(json.dumps(metrics, indent=2))
+    if service.monitor is not None:
+        _, drift = await service.handle("GET", "/drift")
+        print("drift alerts:", drift["alerts"])
+    if service.shadow is not None:
+        service.shadow.close()
+        _, shadow = await service.handle("GET", "/shadow")
+        print("shadow:", json.dumps(shadow))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="HTTP scoring service for the loan default model.")
+    parser.add_argument("--model", default=MODEL_PATH, help="model file: .pkl, .json, .ubj or .cbm (see model_backends.py)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--max-batch", type=int, default=512, help="largest micro-batch sent to predict_proba")
+    parser.add_argument("--max-wait-ms", type=float, default=2.0, help="how long a batch waits to fill")
+    parser.add_argument("--demo", action="store_true", help="run an in-process load test instead of serving")
+    parser.add_argument("--audit", nargs="?", const=audit_log.DB_PATH, metavar="DB",
+                        help="record every decision in the audit log (default: audit_log.sqlite)")
+    parser.add_argument("--monitor", nargs="?", const=monitoring.REFERENCE_PATH, metavar="REFERENCE",
+                        help="track drift against a reference from monitoring.py build-reference")
+    parser.add_argument("--score-mapping", default=scoring_core.SCORE_MAPPING_PATH,
+                        help="fitted score mapping from calibration.py (used if the file exists)")
+    parser.add_argument("--registry", nargs="?", const=model_registry.REGISTRY_DIR, metavar="DIR",
+                        help="serve the registry's production version instead of --model, hot-swapping on promotion")
+    parser.add_argument("--shadow", nargs="?", const=model_registry.SHADOW_LOG_PATH, metavar="LOG",
+                        help="also score every request with the registry's shadow version (default log: shadow_log.csv)")
+    args = parser.parse_args(argv)
+
+    options = {"max_batch": args.max_batch, "max_wait_ms": args.max_wait_ms,
+               "mapping": scoring_core.load_score_mapping(args.score_mapping)}
+    # Registry versions are checked against the mapping as they are served (ScoringService.mapping_for)
+    if args.registry:
+        registry = model_registry.ModelRegistry(args.registry)
+        model = model_registry.LiveModel(registry, "production")
+        if model.current() is None:
+            parser.error(f"no version is promoted to production in {args.registry} (see model_registry.py)")
+        if args.shadow:
+            options["shadow"] = model_registry.ShadowScorer(model_registry.LiveModel(registry, "shadow"), args.shadow)
+    elif args.shadow:
+        parser.error("--shadow needs --registry")
+    else:
+        if not os.path.exists(args.model):
+            parser.error(f"model file '{args.model}' not found")
+        model = model_backends.load_model(args.model)
+        options["model_version"] = file_utils.file_sha256(args.model)
+        options["mapping"] = scoring_core.mapping_for_model(options["mapping"], options["model_version"])
+    if args.monitor:
+        options["monitor"] = monitoring.DriftMonitor.from_file(args.monitor)
+    if args.audit:
+        options["audit"] = audit_log.AuditLog(args.audit)
+
+    if args.demo:
+        asyncio.run(demo(model, **options))
+    else:
+        asyncio.run(serve(model, args.host, args.port, **options))
+
+
+if __name__ == "__main__":
+    main()
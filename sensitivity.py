@@ -0,0 +1,147 @@
+# sensitivity.py
+"""What-if sweep of one applicant over loan amount and term.
+
+score_grid() holds the applicant's other fields fixed and scores a dense
+amount x term grid (200 x 200 by default) in one predict_proba call; the
+sqrt_* derived columns are recomputed for the whole grid by
+scoring_core.engineer_features.
+
+max_approvable_amounts() finds, for each term, the largest amount whose
+score still reaches the decision threshold (scoring_core.GOOD_THRESHOLD, or
+the fitted one from a score mapping; see calibration.py):
+
+- logistic models (pipeline, FastScorer or JSON artifact): solved in closed
+  form. The logit is linear in sqrt_loanamount, so with everything else fixed
+  the boundary is sqrt(amount) = sqrt(low) - logit(low) / weight. A score
+  mapping's calibration is monotone, so the threshold is first mapped back
+  to the raw probability it corresponds to.
+- other backends: vectorized bisection over all terms at once, one
+  predict_proba call per step. This assumes the score falls as the amount
+  grows.
+
+Usage:
+    python sensitivity.py [--age 30 --num_prev_loans 3 ...] [--terms 30 60 90]
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+import fast_scorer
+import file_utils
+import model_backends
+import scoring_core
+
+GRID_SIZE = 200
+
+
+def approval_logit(mapping=None):
+    """Raw model logit at which the credit score reaches the decision threshold."""
+    threshold = scoring_core.good_threshold(mapping)
+    proba = (threshold - scoring_core.MIN_SCORE) / (scoring_core.MAX_SCORE - scoring_core.MIN_SCORE)
+    if mapping is not None:
+        proba = mapping.raw_proba_at(proba)
+    if proba <= 0.0:
+        return float("-inf")
+    if proba >= 1.0:
+        return float("inf")
+    return float(np.log(proba / (1.0 - proba)))
+
+
+def default_axes(size=GRID_SIZE):
+    """Evenly spaced amounts and terms spanning the form's allowed ranges."""
+    amounts = np.linspace(*scoring_core.FIELD_RANGES["loanamount"], size)
+    terms = np.linspace(*scoring_core.FIELD_RANGES["termdays"], size)
+    return amounts, terms
+
+
+def _applicant_frame(applicant, amounts, terms):
+    """Model input frame with one row per (amount, term) pair and the other fields repeated."""
+    amounts = np.asarray(amounts, dtype=float)
+    terms = np.asarray(terms, dtype=float)
+    columns = {"loanamount": amounts, "termdays": terms}
+    for col in scoring_core.INPUT_COLUMNS:
+        if col not in columns:
+            kind = object if col in scoring_core.CATEGORICAL_INPUTS else float
+            columns[col] = np.full(len(amounts), applicant[col], dtype=kind)
+    return pd.DataFrame(scoring_core.engineer_features(columns))[scoring_core.FEATURE_COLUMNS]
+
+
+def score_grid(model, applicant, amounts, terms, mapping=None):
+    """Credit scores over the amount x term grid, shape (len(terms), len(amounts))."""
+    amount_grid, term_grid = np.meshgrid(amounts, terms)
+    frame = _applicant_frame(applicant, amount_grid.ravel(), term_grid.ravel())
+    proba_good = model.predict_proba(frame)[:, 1]
+    return scoring_core.credit_score(proba_good, mapping).reshape(amount_grid.shape)
+
+
+def max_approvable_amounts(model, applicant, terms, low=None, high=None, tolerance=1.0, mapping=None):
+    """Largest approvable amount in [low, high] for each term; NaN where nothing is approvable."""
+    default_low, default_high = scoring_core.FIELD_RANGES["loanamount"]
+    low = float(default_low if low is None else low)
+    high = float(default_high if high is None else high)
+    terms = np.asarray(terms, dtype=float)
+    scorer = fast_scorer.scorer_for(model)
+    if scorer is not None:
+        return _solve_logistic(scorer, applicant, terms, low, high, mapping)
+    return _bisect(model, applicant, terms, low, high, tolerance, mapping)
+
+
+def _solve_logistic(scorer, applicant, terms, low, high, mapping=None):
+    threshold = approval_logit(mapping)
+    weight = scorer.weights[scorer.numeric_columns.index("sqrt_loanamount")]
+    logit_low = scorer.decision_function(_applicant_frame(applicant, np.full(len(terms), low), terms)) - threshold
+    if weight == 0.0:
+        # Amount has no effect on the score: approvable everywhere or nowhere
+        return np.where(logit_low >= 0, high, np.nan)
+    if weight > 0:
+        logit_high = logit_low + weight * (np.sqrt(high) - np.sqrt(low))
+        return np.where(logit_high >= 0, high, np.nan)
+    root = np.sqrt(low) - logit_low / weight
+    return np.where(logit_low >= 0, np.minimum(root ** 2, high), np.nan)
+
+
+def _bisect(model, applicant, terms, low, high, tolerance, mapping=None):
+    def approved(amounts):
+        frame = _applicant_frame(applicant, amounts, terms)
+        score = scoring_core.credit_score(model.predict_proba(frame)[:, 1], mapping)
+        return score >= scoring_core.good_threshold(mapping)
+
+    lo = np.full(len(terms), low)
+    hi = np.full(len(terms), high)
+    feasible = approved(lo)
+    result = np.where(approved(hi), high, np.nan)
+    searching = feasible & np.isnan(result)
+    while searching.any() and (hi - lo)[searching].max() > tolerance:
+        mid = (lo + hi) / 2
+        ok = approved(mid)
+        lo = np.where(searching & ok, mid, lo)
+        hi = np.where(searching & ~ok, mid, hi)
+    return np.where(searching, lo, result)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Largest approvable loan amount per term for one applicant.")
+    parser.add_argument("--model", default=fast_scorer.MODEL_PATH, help="model file (see model_backends.py)")
+    parser.add_argument("--terms", type=float, nargs="+", default=[30, 60, 90, 180, 360, 720])
+    parser.add_argument("--score-mapping", default=scoring_core.SCORE_MAPPING_PATH,
+                        help="fitted score mapping from calibration.py (used if the file exists)")
+    for col in scoring_core.INPUT_COLUMNS:
+        if col in ("loanamount", "termdays"):
+            continue
+        kind = str if col in scoring_core.CATEGORICAL_INPUTS else float
+        parser.add_argument(f"--{col}", type=kind, default=scoring_core.FIELD_DEFAULTS[col])
+    args = parser.parse_args(argv)
+
+    model = model_backends.load_model(args.model)
+    applicant = {col: getattr(args, col) for col in scoring_core.INPUT_COLUMNS if hasattr(args, col)}
+    mapping = scoring_core.mapping_for_model(scoring_core.load_score_mapping(args.score_mapping),
+                                             file_utils.file_sha256(args.model))
+    limits = max_approvable_amounts(model, applicant, args.terms, mapping=mapping)
+    for term, limit in zip(args.terms, limits):
+        print(f"{term:6.0f} days: " + ("not approvable" if np.isnan(limit) else f"up to {limit:,.0f}"))
+
+
+if __name__ == "__main__":
+    main()
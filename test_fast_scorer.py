@@ -0,0 +1,61 @@
+# test_fast_scorer.py
+"""Parity of the NumPy fast path with the pickled pipeline.
+
+Run with: python -m pytest test_fast_scorer.py
+(python fast_scorer.py --check reports the same differences plus latency.)
+"""
+
+import os
+
+import numpy as np
+import pytest
+
+import fast_scorer
+
+TOLERANCE = 1e-9
+
+pytestmark = pytest.mark.skipif(not os.path.exists(fast_scorer.MODEL_PATH),
+                                reason=f"{fast_scorer.MODEL_PATH} not found")
+
+
+@pytest.fixture(scope="module")
+def model():
+    import joblib
+
+    return joblib.load(fast_scorer.MODEL_PATH)
+
+
+@pytest.fixture(scope="module")
+def applicants():
+    return fast_scorer.parity_frame(n_random=20000)
+
+
+@pytest.fixture(scope="module")
+def expected(model, applicants):
+    return model.predict_proba(applicants)[:, 1]
+
+
+def test_vectorized_matches_pipeline(model, applicants, expected):
+    scorer = fast_scorer.FastScorer.from_pipeline(model)
+    np.testing.assert_allclose(scorer.proba_good(applicants), expected, rtol=0, atol=TOLERANCE)
+
+
+def test_predict_proba_matches_pipeline(model, applicants):
+    scorer = fast_scorer.FastScorer.from_pipeline(model)
+    np.testing.assert_allclose(scorer.predict_proba(applicants), model.predict_proba(applicants),
+                               rtol=0, atol=TOLERANCE)
+
+
+def test_single_row_matches_pipeline(model, applicants, expected):
+    scorer = fast_scorer.FastScorer.from_pipeline(model)
+    # Every 50th row, so real and perturbed applicants (and unseen categories) are all sampled
+    rows = np.arange(0, len(applicants), 50)
+    records = applicants.iloc[rows].to_dict("records")
+    single = np.array([scorer.proba_one(record) for record in records])
+    np.testing.assert_allclose(single, expected[rows], rtol=0, atol=TOLERANCE)
+
+
+@pytest.mark.skipif(not os.path.exists(fast_scorer.ARTIFACT_PATH), reason=f"{fast_scorer.ARTIFACT_PATH} not found")
+def test_artifact_matches_pipeline(applicants, expected):
+    scorer = fast_scorer.load_artifact(fast_scorer.ARTIFACT_PATH)
+    np.testing.assert_allclose(scorer.proba_good(applicants), expected, rtol=0, atol=TOLERANCE)
@@ -0,0 +1,197 @@
+# train_model.py
+"""Rebuild logistic_loan_default.pkl from the three CSVs with a parallel hyperparameter search.
+
+Features come from feature_store.py and scoring_core.py, so training uses the
+same inputs the app and batch jobs score with. The pipeline matches the
+shipped model: ColumnTransformer (StandardScaler + OneHotEncoder) -> SMOTE ->
+VarianceThreshold -> LogisticRegression.
+
+Candidates are cross-validated in a process pool over all cores (joblib/loky).
+Fitted transformer stages are cached on disk with joblib.Memory, so the
+scaler/encoder and SMOTE resampling for a fold are computed once and reused by
+every classifier setting that shares them.
+
+Usage:
+    python train_model.py [--output logistic_loan_default.pkl] [--jobs -1] [--quick]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import joblib
+import numpy as np
+from imblearn.over_sampling import SMOTE
+from imblearn.pipeline import Pipeline
+from sklearn.compose import ColumnTransformer
+from sklearn.feature_selection import VarianceThreshold
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import accuracy_score, f1_score, precision_score, recall_score, roc_auc_score
+from sklearn.model_selection import GridSearchCV, StratifiedKFold, train_test_split
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+import batch_scoring
+import fast_scorer
+import feature_store
+
+# Scaled numeric inputs, in the order the shipped pipeline uses
+SCALED_COLUMNS = [
+    "repayment_curr_ratio",
+    "num_prev_loans",
+    "avg_repay_delay_days",
+    "total_firstrepaid_late",
+    "avg_prev_repayment_ratio",
+    "avg_duration_days",
+    "age",
+    "sqrt_late_payment_rate",
+    "sqrt_termdays",
+    "sqrt_loanamount",
+    "sqrt_avg_prev_interest",
+    "sqrt_repayment_efficiency",
+]
+ENCODED_COLUMNS = ["bank_account_type", "employment_status_clients"]
+MODEL_COLUMNS = SCALED_COLUMNS + ENCODED_COLUMNS
+
+PARAM_GRID = [
+    {
+        "smote__k_neighbors": [3, 5, 7, 9],
+        "classifier__penalty": ["l1", "l2"],
+        "classifier__C": [0.01, 0.03, 0.1, 0.3, 1.0, 3.0],
+    },
+    {
+        "smote__k_neighbors": [3, 5, 7, 9],
+        "classifier__penalty": ["elasticnet"],
+        "classifier__C": [0.01, 0.03, 0.1, 0.3, 1.0, 3.0],
+        "classifier__l1_ratio": [0.15, 0.5, 0.85],
+    },
+]
+QUICK_PARAM_GRID = {
+    "smote__k_neighbors": [3, 5],
+    "classifier__penalty": ["l1", "l2"],
+    "classifier__C": [0.1, 1.0],
+}
+
+
+def build_pipeline(memory=None):
+    preprocessor = ColumnTransformer([
+        ("scaled_num", Pipeline([("scaler", StandardScaler())]), SCALED_COLUMNS),
+        ("encoded_cat", Pipeline([("encoder", OneHotEncoder(handle_unknown="ignore", sparse_output=False))]),
+         ENCODED_COLUMNS),
+    ])
+    return Pipeline([
+        ("preprocessor", preprocessor),
+        ("smote", SMOTE(random_state=42)),
+        ("var_thresh", VarianceThreshold(threshold=0.01)),
+        ("classifier", LogisticRegression(C=0.1, penalty="l1", solver="saga", max_iter=5000, random_state=42)),
+    ], memory=memory)
+
+
+def load_training_data():
+    """Model inputs X (MODEL_COLUMNS) and target y (1 = Good) for every trainperf.csv loan."""
+    frame = feature_store.load_training_frame()
+    X = batch_scoring.feature_frame(frame)[MODEL_COLUMNS].reset_index(drop=True)
+    y = frame["target"].to_numpy()
+    return X, y
+
+
+def holdout_metrics(model, X, y):
+    proba_good = model.predict_proba(X)[:, 1]
+    predicted = (proba_good >= 0.5).astype(int)
+    return {
+        "roc_auc": roc_auc_score(y, proba_good),
+        "accuracy": accuracy_score(y, predicted),
+        "precision_good": precision_score(y, predicted),
+        "recall_good": recall_score(y, predicted),
+        "f1_good": f1_score(y, predicted),
+        "recall_bad": recall_score(1 - y, 1 - predicted),
+    }
+
+
+def train(param_grid, jobs=-1, folds=5, test_size=0.2, seed=42, cache_dir=None):
+    """Search param_grid, report holdout metrics, then refit the best pipeline on all rows."""
+    X, y = load_training_data()
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=test_size, stratify=y, random_state=seed)
+
+    own_cache = cache_dir is None
+    cache_dir = cache_dir or tempfile.mkdtemp(prefix="loan_default_cache_")
+    try:
+        search = GridSearchCV(
+            build_pipeline(memory=joblib.Memory(cache_dir, verbose=0)),
+            param_grid,
+            scoring="roc_auc",
+            cv=StratifiedKFold(n_splits=folds, shuffle=True, random_state=seed),
+            n_jobs=jobs,
+            refit=True,
+        )
+        start = time.perf_counter()
+        search.fit(X_train, y_train)
+        search_seconds = time.perf_counter() - start
+    finally:
+        if own_cache:
+            shutil.rmtree(cache_dir, ignore_errors=True)
+
+    holdout = holdout_metrics(search.best_estimator_, X_test, y_test)
+
+    # Final model: best settings refit on every row, as the shipped pickle was
+    final = build_pipeline().set_params(**search.best_params_)
+    start = time.perf_counter()
+    final.fit(X, y)
+    refit_seconds = time.perf_counter() - start
+
+    results = search.cv_results_
+    order = np.argsort(results["rank_test_score"])
+    report = {
+        "rows": int(len(X)),
+        "positive_rate": float(y.mean()),
+        "folds": folds,
+        "jobs": jobs,
+        "cpu_count": os.cpu_count(),
+        "candidates": int(len(results["params"])),
+        "search_seconds": search_seconds,
+        "refit_seconds": refit_seconds,
+        "best_params": search.best_params_,
+        "best_cv_roc_auc": float(search.best_score_),
+        "holdout": holdout,
+        "top_candidates": [
+            {
+                "params": results["params"][i],
+                "mean_cv_roc_auc": float(results["mean_test_score"][i]),
+                "std_cv_roc_auc": float(results["std_test_score"][i]),
+            }
+            for i in order[:10]
+        ],
+    }
+    return final, report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train the logistic loan default pipeline from the CSVs.")
+    parser.add_argument("--output", default="logistic_loan_default.pkl", help="where to write the fitted pipeline")
+    parser.add_argument("--metrics", default="training_metrics.json", help="where to write the metrics report")
+    parser.add_argument("--jobs", type=int, default=-1, help="worker processes for the search (-1 = all cores)")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--cache-dir", help="keep the fitted-stage cache here instead of a temp directory")
+    parser.add_argument("--quick", action="store_true", help="search a small grid (smoke test)")
+    args = parser.parse_args(argv)
+
+    final, report = train(QUICK_PARAM_GRID if args.quick else PARAM_GRID,
+                          jobs=args.jobs, folds=args.folds, cache_dir=args.cache_dir)
+
+    joblib.dump(final, args.output)
+    artifact = os.path.splitext(args.output)[0] + ".json"
+    fast_scorer.save_artifact(fast_scorer.flatten_pipeline(final), artifact, source=args.output)
+    with open(args.metrics, "w") as f:
+        json.dump(report, f, indent=2, default=str)
+
+    print(f"Searched {report['candidates']} candidates x {args.folds} folds in {report['search_seconds']:.1f}s "
+          f"(jobs={args.jobs}, {report['cpu_count']} cores)")
+    print(f"Best params: {report['best_params']}")
+    print(f"CV ROC AUC {report['best_cv_roc_auc']:.4f}, holdout ROC AUC {report['holdout']['roc_auc']:.4f}")
+    print(f"Wrote {args.output}, {artifact} and {args.metrics}")
+
+
+if __name__ == "__main__":
+    main()